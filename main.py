@@ -10,10 +10,18 @@ import os
 import sys
 import time
 import signal
+import threading
 import yaml
+import cv2
+from functools import partial
 from pathlib import Path
 from dotenv import load_dotenv
 
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 # Add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
@@ -22,6 +30,7 @@ from siyi_controller import SIYIMKController
 from livekit_streamer import LiveKitStreamManager
 from telemetry import JetsonTelemetry
 from web_server import WebServer
+from worker import SingleThreadWorker
 
 
 class StreamOrchestrator:
@@ -50,11 +59,32 @@ class StreamOrchestrator:
         self.telemetry = None
         self.web_server = None
         
+        # Per-sink frame workers (latest frame wins)
+        self.siyi_worker = None
+        self.livekit_worker = None
+        self.web_worker = None
+        
+        # Per-sink output resolution, None keeps the full camera frame
+        self.siyi_resolution = self._get_resolution('siyi')
+        self.web_resolution = self._get_resolution('web_ui')
+        
         # State
         self.running = False
         self.frame_count = 0
         self.start_time = None
         
+        # Stream FPS as an exponential moving average of frame intervals
+        self.stream_fps = 0.0
+        self._last_frame_ns = None
+        
+        # Enabled sinks, resolved once in _build_sinks()
+        self._frame_sinks = []
+        self._telemetry_sinks = []
+        
+        # Telemetry dispatch thread
+        self.telemetry_thread = None
+        self._telemetry_wake = threading.Event()
+        
         logger.info("Stream Orchestrator initialized")
     
     def _load_config(self, config_path: str) -> dict:
@@ -63,7 +93,7 @@ class StreamOrchestrator:
         load_dotenv()
         
         with open(config_path, 'r') as f:
-            config = yaml.safe_load(f)
+            config = yaml.load(f, Loader=SafeLoader)
         
         # Override with environment variables if present
         if 'LIVEKIT_URL' in os.environ:
@@ -77,6 +107,19 @@ class StreamOrchestrator:
         
         return config
     
+    def _worker_scheduling(self, section: str) -> dict:
+        """Get the optional CPU pinning and niceness for a sink's frame worker."""
+        sink_config = self.config.get(section, {})
+        return {
+            'cpu': sink_config.get('worker_cpu'),
+            'nice': sink_config.get('worker_nice', 0)
+        }
+    
+    def _get_resolution(self, section: str):
+        """Get the optional (width, height) output resolution for a sink."""
+        resolution = self.config.get(section, {}).get('resolution')
+        return tuple(resolution) if resolution else None
+    
     def _setup_logging(self):
         """Setup logging configuration."""
         log_config = self.config.get('logging', {})
@@ -135,9 +178,17 @@ class StreamOrchestrator:
             # Initialize LiveKit streamer (if enabled)
             if self.config.get('livekit', {}).get('enabled', True):
                 logger.info("Initializing LiveKit streamer...")
-                self.livekit = LiveKitStreamManager(self.config['livekit'])
-                # LiveKit initialization happens in background
-                logger.info("✓ LiveKit streamer initialized")
+                livekit_config = self.config['livekit']
+                self.livekit = LiveKitStreamManager(livekit_config)
+                # LiveKit connection and publishing run on a background loop
+                if self.livekit.start(
+                    livekit_config.get('width', self.camera.width),
+                    livekit_config.get('height', self.camera.height),
+                    livekit_config.get('fps', self.camera.fps)
+                ):
+                    logger.info("✓ LiveKit streamer initialized")
+                else:
+                    logger.warning("Failed to connect to LiveKit (continuing anyway)")
             
             # Initialize telemetry
             if self.config.get('telemetry', {}).get('enabled', True):
@@ -153,6 +204,21 @@ class StreamOrchestrator:
                 self.web_server.run_threaded()
                 logger.info(f"✓ Web server started on {self.config['web_ui']['host']}:{self.config['web_ui']['port']}")
             
+            # Start per-sink frame workers
+            if self.siyi:
+                self.siyi_worker = SingleThreadWorker('siyi-frames', **self._worker_scheduling('siyi'))
+                self.siyi_worker.start()
+            if self.livekit:
+                # Single slot: the streamer's publish mailbox already keeps only the
+                # newest frame, so converting older queued frames would be wasted
+                self.livekit_worker = SingleThreadWorker('livekit-frames', **self._worker_scheduling('livekit'))
+                self.livekit_worker.start()
+            if self.web_server:
+                self.web_worker = SingleThreadWorker('web-frames', **self._worker_scheduling('web_ui'))
+                self.web_worker.start()
+            
+            self._build_sinks()
+            
             logger.info("All components initialized successfully!")
             return True
             
@@ -160,27 +226,129 @@ class StreamOrchestrator:
             logger.error(f"Error initializing components: {e}", exc_info=True)
             return False
     
-    def _process_frame(self, frame, timestamp):
+    def _build_sinks(self):
         """
-        Process a single frame and distribute to outputs.
+        Resolve enabled frame and telemetry sinks once.
         
-        Args:
-            frame: Video frame
-            timestamp: Frame timestamp
+        Each sink is a closure over bound methods, so the per-frame and
+        per-tick paths just iterate a list without config or attribute lookups.
         """
-        self.frame_count += 1
+        scaled = self._scaled
+        hold_frame = self.camera.hold_frame
+        frame_sinks = []
+        telemetry_sinks = []
+        
+        def submit_frame(submit, send, out, frame):
+            """Queue send(out) on a worker; a camera ring slot stays held until it has run."""
+            if out is not frame:
+                submit(partial(send, out))
+                return
+            
+            release = hold_frame()
+            
+            def job():
+                try:
+                    send(out)
+                finally:
+                    release()
+            
+            submit(job, on_drop=release)
         
-        # Send to SIYI transmitter
+        # SIYI transmitter (only if the connection succeeded)
         if self.siyi and self.siyi.connected:
-            self.siyi.send_video_frame(frame, quality=80)
+            siyi_submit = self.siyi_worker.try_submit
+            siyi_send = partial(self.siyi.send_video_frame, quality=80)
+            siyi_size = self.siyi_resolution
+            
+            def siyi_sink(frame, levels):
+                submit_frame(siyi_submit, siyi_send, scaled(frame, siyi_size, levels), frame)
+            
+            frame_sinks.append(siyi_sink)
+            telemetry_sinks.append(self.siyi.send_telemetry)
         
-        # Send to LiveKit
+        # LiveKit
         if self.livekit:
-            self.livekit.send_frame(frame)
+            livekit_submit = self.livekit_worker.try_submit
+            livekit_send = self.livekit.send_frame
+            
+            def livekit_sink(frame, levels):
+                # Full frame; the streamer resizes to its publish size while converting
+                submit_frame(livekit_submit, livekit_send, frame, frame)
+            
+            frame_sinks.append(livekit_sink)
+            telemetry_sinks.append(self.livekit.send_telemetry)
         
-        # Update web server
+        # Web server (only downscale while someone is watching)
         if self.web_server:
-            self.web_server.update_frame(frame)
+            web_server = self.web_server
+            web_submit = self.web_worker.try_submit
+            web_update = web_server.update_frame
+            web_size = self.web_resolution
+            
+            def web_sink(frame, levels):
+                if web_server.viewer_count:
+                    # The web server keeps its frame for viewers with no end point
+                    # to release a hold, so a full-resolution slot is copied
+                    out = scaled(frame, web_size, levels)
+                    web_submit(partial(web_update, out.copy() if out is frame else out))
+            
+            frame_sinks.append(web_sink)
+            telemetry_sinks.append(web_server.update_telemetry)
+        
+        self._frame_sinks = frame_sinks
+        self._telemetry_sinks = telemetry_sinks
+    
+    @staticmethod
+    def _scaled(frame, size, levels: dict):
+        """
+        Get the frame downscaled to a sink resolution.
+        
+        Each size is resized once per tick and shared by every sink that asks for it.
+        Without downscaling the camera ring slot itself is returned; sinks that
+        use it after the tick must hold it (see submit_frame in _build_sinks).
+        
+        Args:
+            frame: Full-resolution video frame (camera ring slot)
+            size: Target (width, height), or None for the full frame
+            levels: Per-tick cache of already downscaled frames
+        """
+        if size is None or (frame.shape[1] <= size[0] and frame.shape[0] <= size[1]):
+            return frame
+        
+        scaled = levels.get(size)
+        if scaled is None:
+            scaled = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            levels[size] = scaled
+        return scaled
+    
+    def _process_frame(self, frame, timestamp):
+        """
+        Process a single frame and distribute to outputs.
+        
+        Each sink runs on its own worker thread, so sinks process the frame
+        concurrently and per-frame dispatch costs max(sinks), not sum(sinks).
+        
+        Args:
+            frame: Video frame
+            timestamp: Frame capture time from time.monotonic_ns()
+        """
+        self.frame_count += 1
+        
+        # Update stream FPS EMA from the monotonic capture timestamps
+        if self._last_frame_ns is not None:
+            dt_ns = timestamp - self._last_frame_ns
+            if dt_ns > 0:
+                self.stream_fps = 0.9 * self.stream_fps + 0.1 * (1e9 / dt_ns)
+        self._last_frame_ns = timestamp
+        
+        # Kick an immediate telemetry update once frames start flowing
+        if self.frame_count == 1:
+            self._telemetry_wake.set()
+        
+        # Dispatch to all enabled sinks, sharing downscaled levels
+        levels = {}
+        for sink in self._frame_sinks:
+            sink(frame, levels)
     
     def _update_telemetry(self):
         """Update telemetry data to all outputs."""
@@ -191,64 +359,60 @@ class StreamOrchestrator:
         if self.camera:
             self.telemetry.update_camera_fps(self.camera.get_fps())
         
-        # Calculate stream FPS
-        if self.start_time:
-            elapsed = time.time() - self.start_time
-            if elapsed > 0:
-                stream_fps = self.frame_count / elapsed
-                self.telemetry.update_stream_fps(stream_fps)
-        
-        # Get current telemetry data
-        telemetry_data = self.telemetry.get_current_data()
-        
-        # Add connection status
-        telemetry_data['siyi_connected'] = self.siyi.connected if self.siyi else False
-        telemetry_data['livekit_connected'] = (
-            self.livekit.streamer.connected 
-            if self.livekit and self.livekit.streamer 
-            else False
-        )
-        
-        # Send to SIYI
-        if self.siyi and self.siyi.connected:
-            self.siyi.send_telemetry(telemetry_data)
+        # Update stream FPS
+        self.telemetry.update_stream_fps(self.stream_fps)
+        
+        # Current telemetry plus connection status, built as one new dict:
+        # the collector's snapshot is shared and must not be mutated
+        telemetry_data = {
+            **self.telemetry.get_current_data(),
+            'siyi_connected': self.siyi.connected if self.siyi else False,
+            'livekit_connected': (
+                self.livekit.streamer.connected
+                if self.livekit and self.livekit.streamer
+                else False
+            )
+        }
         
-        # Send to LiveKit
-        if self.livekit:
-            self.livekit.send_telemetry(telemetry_data)
+        # Send to all enabled sinks
+        for sink in self._telemetry_sinks:
+            sink(telemetry_data)
+    
+    def _telemetry_loop(self):
+        """Push telemetry to all outputs at a fixed rate, independent of frame cadence."""
+        telemetry_interval = 1.0 / self.config.get('telemetry', {}).get('rate_hz', 5)
         
-        # Send to web server
-        if self.web_server:
-            self.web_server.update_telemetry(telemetry_data)
+        while self.running:
+            try:
+                self._update_telemetry()
+            except Exception as e:
+                logger.error(f"Error updating telemetry: {e}")
+            
+            self._telemetry_wake.wait(telemetry_interval)
+            self._telemetry_wake.clear()
     
     def _main_loop(self):
         """Main processing loop."""
         logger.info("Starting main processing loop...")
         self.start_time = time.time()
         self.frame_count = 0
+        self.stream_fps = 0.0
+        self._last_frame_ns = None
         
-        last_telemetry_update = time.time()
-        telemetry_interval = 1.0 / self.config.get('telemetry', {}).get('rate_hz', 5)
+        # Bind per-frame calls once
+        read_frame = self.camera.read
+        process_frame = self._process_frame
         
         try:
             while self.running:
-                # Get frame from camera
-                frame_data = self.camera.get_latest_frame()
+                # Wait for the capture thread to publish a frame
+                frame_data = read_frame(timeout=0.5)
                 
                 if frame_data is None:
-                    time.sleep(0.01)
                     continue
                 
-                frame, timestamp = frame_data
-                
                 # Process frame
-                self._process_frame(frame, timestamp)
-                
-                # Update telemetry periodically
-                current_time = time.time()
-                if current_time - last_telemetry_update >= telemetry_interval:
-                    self._update_telemetry()
-                    last_telemetry_update = current_time
+                process_frame(*frame_data)
                 
         except KeyboardInterrupt:
             logger.info("Received keyboard interrupt")
@@ -284,6 +448,10 @@ class StreamOrchestrator:
         logger.info("Press Ctrl+C to stop")
         logger.info("=" * 60)
         
+        # Start telemetry dispatch
+        self.telemetry_thread = threading.Thread(target=self._telemetry_loop, daemon=True)
+        self.telemetry_thread.start()
+        
         # Run main loop
         self._main_loop()
         
@@ -293,6 +461,16 @@ class StreamOrchestrator:
         """Stop the streaming system."""
         logger.info("Stopping streaming system...")
         self.running = False
+        self._telemetry_wake.set()
+        
+        if self.telemetry_thread:
+            self.telemetry_thread.join(timeout=2.0)
+            self.telemetry_thread = None
+        
+        # Stop frame workers before the sinks they feed
+        for worker in (self.web_worker, self.livekit_worker, self.siyi_worker):
+            if worker:
+                worker.stop()
         
         # Stop components in reverse order
         if self.telemetry:
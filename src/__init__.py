@@ -11,6 +11,9 @@ from .siyi_controller import SIYIMKController
 from .livekit_streamer import LiveKitStreamer, LiveKitStreamManager
 from .telemetry import JetsonTelemetry
 from .web_server import WebServer
+from .worker import SingleThreadWorker
+from .jpeg_encoder import JpegEncoder
+from .udp_sender import UdpFragmentSender
 
 __all__ = [
     'JetsonCamera',
@@ -19,4 +22,7 @@ __all__ = [
     'LiveKitStreamManager',
     'JetsonTelemetry',
     'WebServer',
+    'SingleThreadWorker',
+    'JpegEncoder',
+    'UdpFragmentSender',
 ]
@@ -6,10 +6,16 @@ Supports both standard USB cameras and CSI cameras on Jetson platforms.
 import cv2
 import numpy as np
 import threading
-import queue
 import time
 import logging
-from typing import Optional, Tuple
+from collections import deque
+from functools import partial
+from typing import Callable, Optional, Tuple
+
+try:
+    from .worker import set_thread_scheduling
+except ImportError:
+    from worker import set_thread_scheduling
 
 logger = logging.getLogger(__name__)
 
@@ -29,11 +35,27 @@ class JetsonCamera:
         """
         self.config = config
         self.camera = None
-        self.frame_queue = queue.Queue(maxsize=30)
+        # Single-slot latest-frame buffer (one producer, one consumer)
+        self._latest = deque(maxlen=1)
+        self._frame_ready = threading.Event()
+        
+        # Pre-allocated frame ring buffer, sized once the camera is opened
+        self.ring_size = config.get('ring_size', 5)
+        self._ring = []
+        
+        # Per-slot hold counts (mailbox, consumer, sinks); capture only
+        # decodes into slots nobody holds
+        self._slot_holds = []
+        self._holds_lock = threading.Lock()
+        self._consumer_slot = None  # Slot of the frame last handed to the consumer
+        
+        # Consumer pacing, used to decode only grabs the consumer will take
+        self._waiting = False  # Consumer is blocked in read()
+        self._take_ns = 0  # Last time the consumer took a frame
+        self._take_period_ns = 0  # Smoothed time between takes
+        self._take_due_ns = 0  # When the consumer is expected back
         self.capture_thread = None
         self.running = False
-        self.frame_count = 0
-        self.last_fps_time = time.time()
         self.current_fps = 0
         
         # Camera settings
@@ -43,6 +65,15 @@ class JetsonCamera:
         self.fps = config.get('fps', 30)
         self.use_gstreamer = config.get('use_gstreamer', True)
         
+        # NV12 appsink output skips the CPU videoconvert stage; frames are
+        # converted to BGR once, directly into the ring buffer
+        self.nv12 = self.use_gstreamer and config.get('capture_format', 'BGR').upper() == 'NV12'
+        self._nv12_buf = None
+        
+        # Capture thread scheduling (Linux only)
+        self.capture_cpu = config.get('capture_cpu')
+        self.capture_rt_priority = config.get('capture_rt_priority', 0)
+        
     def _build_gstreamer_pipeline(self) -> str:
         """
         Build GStreamer pipeline for Jetson hardware acceleration.
@@ -61,6 +92,16 @@ class JetsonCamera:
             return pipeline
         
         # Default pipeline for CSI camera (e.g., Raspberry Pi Camera on Jetson)
+        if self.nv12:
+            return (
+                f"nvarguscamerasrc sensor-id={self.device_id} ! "
+                f"video/x-raw(memory:NVMM), width={self.width}, height={self.height}, "
+                f"framerate={self.fps}/1 ! "
+                f"nvvidconv ! "
+                f"video/x-raw, format=NV12 ! "
+                f"appsink max-buffers=1 drop=true sync=false"
+            )
+        
         pipeline = (
             f"nvarguscamerasrc sensor-id={self.device_id} ! "
             f"video/x-raw(memory:NVMM), width={self.width}, height={self.height}, "
@@ -69,7 +110,7 @@ class JetsonCamera:
             f"video/x-raw, format=BGRx ! "
             f"videoconvert ! "
             f"video/x-raw, format=BGR ! "
-            f"appsink"
+            f"appsink max-buffers=1 drop=true sync=false"
         )
         return pipeline
     
@@ -94,6 +135,10 @@ class JetsonCamera:
                 self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
                 self.camera.set(cv2.CAP_PROP_FPS, self.fps)
                 
+                # Keep only the freshest frame in the driver queue
+                if not self.camera.set(cv2.CAP_PROP_BUFFERSIZE, 1):
+                    logger.warning("Camera does not support CAP_PROP_BUFFERSIZE, frames may be stale")
+                
                 # Try to set format if specified
                 if 'format' in self.config:
                     fourcc = cv2.VideoWriter_fourcc(*self.config['format'])
@@ -109,47 +154,124 @@ class JetsonCamera:
             actual_fps = int(self.camera.get(cv2.CAP_PROP_FPS))
             
             logger.info(f"Camera opened: {actual_width}x{actual_height} @ {actual_fps}fps")
+            
+            self._allocate_ring(actual_width or self.width, actual_height or self.height)
             return True
             
         except Exception as e:
             logger.error(f"Error opening camera: {e}")
             return False
     
+    def _allocate_ring(self, width: int, height: int):
+        """
+        Allocate the frame ring buffer that capture decodes into.
+        
+        Args:
+            width: Frame width in pixels
+            height: Frame height in pixels
+        """
+        shape = (height, width, 3)
+        
+        self._ring = [np.empty(shape, dtype=np.uint8)
+                      for _ in range(self.ring_size)]
+        
+        self._slot_holds = [0] * self.ring_size
+        self._consumer_slot = None
+        
+        if self.nv12:
+            # Y plane followed by interleaved UV plane at half height
+            self._nv12_buf = np.empty((height * 3 // 2, width), dtype=np.uint8)
+    
+    def _promote_capture_thread(self):
+        """Pin the calling capture thread to a core and raise its priority."""
+        # Fall back to nice -10 if SCHED_FIFO is requested but not permitted
+        set_thread_scheduling("Capture thread", self.capture_cpu, self.capture_rt_priority,
+                              nice=-10 if self.capture_rt_priority else 0)
+    
     def _capture_loop(self):
         """Background thread for continuous frame capture."""
         logger.info("Starting capture loop")
+        self._promote_capture_thread()
+        
+        # Bind hot-path attributes and methods to locals once
+        grab = self.camera.grab
+        retrieve = self.camera.retrieve
+        monotonic_ns = time.monotonic_ns
+        latest = self._latest
+        signal_ready = self._frame_ready.set
+        ring = self._ring
+        ring_size = self.ring_size
+        holds = self._slot_holds
+        holds_lock = self._holds_lock
+        nv12 = self.nv12
+        nv12_buf = self._nv12_buf
+        cvt_nv12 = cv2.COLOR_YUV2BGR_NV12
+        write_idx = 0
+        frame_count = 0
+        last_fps_ns = monotonic_ns()
+        last_grab_ns = last_fps_ns
+        grab_interval_ns = 0  # Smoothed time between grabs
         
         while self.running:
             try:
-                ret, frame = self.camera.read()
-                
-                if not ret:
+                # Grab is cheap; decoding is deferred until the frame is needed
+                if not grab():
                     logger.warning("Failed to read frame from camera")
                     time.sleep(0.1)
                     continue
                 
-                # Update FPS counter
-                self.frame_count += 1
-                current_time = time.time()
-                elapsed = current_time - self.last_fps_time
+                # Update FPS counter (one clock read per frame)
+                frame_count += 1
+                now_ns = monotonic_ns()
+                elapsed_ns = now_ns - last_fps_ns
+                
+                if elapsed_ns >= 1_000_000_000:
+                    self.current_fps = frame_count * 1e9 / elapsed_ns
+                    frame_count = 0
+                    last_fps_ns = now_ns
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug(f"Camera FPS: {self.current_fps:.2f}")
+                
+                grab_interval_ns += (now_ns - last_grab_ns - grab_interval_ns) >> 3
+                last_grab_ns = now_ns
                 
-                if elapsed >= 1.0:
-                    self.current_fps = self.frame_count / elapsed
-                    self.frame_count = 0
-                    self.last_fps_time = current_time
-                    logger.debug(f"Camera FPS: {self.current_fps:.2f}")
+                # Decode only a grab the consumer is about to take: while it waits
+                # in read(), or once it is due back before the next grab arrives.
+                # An untaken frame is then replaced by each newer grab, so a taken
+                # frame is at most about one grab interval old.
+                if not self._waiting and now_ns + grab_interval_ns < self._take_due_ns:
+                    continue
+                
+                # Next ring slot nobody holds; if sinks hold them all, drop this frame
+                with holds_lock:
+                    for _ in range(ring_size):
+                        if not holds[write_idx]:
+                            break
+                        write_idx = (write_idx + 1) % ring_size
+                    else:
+                        continue
+                
+                # Decode into the ring slot instead of a fresh array
+                if nv12:
+                    ret, yuv = retrieve(nv12_buf)
+                    if ret:
+                        frame = cv2.cvtColor(yuv, cvt_nv12, dst=ring[write_idx])
+                else:
+                    ret, frame = retrieve(ring[write_idx])
+                if not ret:
+                    logger.warning("Failed to decode frame from camera")
+                    continue
+                
+                # Publish latest frame; the mailbox holds its slot until the
+                # consumer takes it or a newer frame replaces it
+                with holds_lock:
+                    if latest:
+                        holds[latest.pop()[2]] -= 1
+                    holds[write_idx] += 1
+                    latest.append((frame, now_ns, write_idx))
+                signal_ready()
+                write_idx = (write_idx + 1) % ring_size
                 
-                # Add frame to queue (drop oldest if full)
-                try:
-                    self.frame_queue.put_nowait((frame, current_time))
-                except queue.Full:
-                    # Remove oldest frame and add new one
-                    try:
-                        self.frame_queue.get_nowait()
-                        self.frame_queue.put_nowait((frame, current_time))
-                    except:
-                        pass
-                        
             except Exception as e:
                 logger.error(f"Error in capture loop: {e}")
                 time.sleep(0.1)
@@ -177,38 +299,76 @@ class JetsonCamera:
         logger.info("Camera capture started")
         return True
     
-    def read(self, timeout: float = 1.0) -> Optional[Tuple[np.ndarray, float]]:
+    def read(self, timeout: float = 1.0) -> Optional[Tuple[np.ndarray, int]]:
         """
-        Read the latest frame from the queue.
+        Wait for and read the latest frame.
         
         Args:
             timeout: Timeout in seconds
             
         Returns:
-            Tuple of (frame, timestamp) or None if no frame available
+            Tuple of (frame, timestamp_ns) or None if no frame available,
+            where timestamp_ns is the time.monotonic_ns() capture time
         """
+        self._waiting = True
         try:
-            return self.frame_queue.get(timeout=timeout)
-        except queue.Empty:
-            return None
+            if not self._frame_ready.wait(timeout):
+                return None
+        finally:
+            self._waiting = False
+        return self.get_latest_frame()
     
-    def get_latest_frame(self) -> Optional[Tuple[np.ndarray, float]]:
+    def get_latest_frame(self) -> Optional[Tuple[np.ndarray, int]]:
         """
         Get the most recent frame, discarding older ones.
         
+        The frame is a ring slot, valid until the next call unless it is kept
+        with hold_frame().
+        
         Returns:
-            Tuple of (frame, timestamp) or None if no frame available
+            Tuple of (frame, timestamp_ns) or None if no frame available,
+            where timestamp_ns is the time.monotonic_ns() capture time
         """
-        frame_data = None
-        
-        # Get all available frames, keeping only the latest
-        while True:
+        self._frame_ready.clear()
+        with self._holds_lock:
+            # The previous frame goes back to the ring unless a sink holds it
+            if self._consumer_slot is not None:
+                self._slot_holds[self._consumer_slot] -= 1
+                self._consumer_slot = None
+            
             try:
-                frame_data = self.frame_queue.get_nowait()
-            except queue.Empty:
-                break
+                frame, timestamp, slot = self._latest.pop()
+            except IndexError:
+                return None
+            
+            # The mailbox's hold passes to the consumer
+            self._consumer_slot = slot
+        
+        # Track the consumer's pace so capture can time its next decode
+        now_ns = time.monotonic_ns()
+        if self._take_ns:
+            self._take_period_ns += (now_ns - self._take_ns - self._take_period_ns) >> 2
+        self._take_ns = now_ns
+        self._take_due_ns = now_ns + self._take_period_ns
+        return frame, timestamp
+    
+    def hold_frame(self) -> Callable[[], None]:
+        """
+        Keep the frame last returned by read()/get_latest_frame() out of the
+        ring, e.g. while a sink worker still uses it.
         
-        return frame_data
+        Returns:
+            Function that releases the hold; call it exactly once
+        """
+        slot = self._consumer_slot
+        with self._holds_lock:
+            self._slot_holds[slot] += 1
+        return partial(self._release_slot, slot)
+    
+    def _release_slot(self, slot: int):
+        """Drop one hold on a ring slot."""
+        with self._holds_lock:
+            self._slot_holds[slot] -= 1
     
     def get_fps(self) -> float:
         """Get current capture FPS."""
@@ -0,0 +1,128 @@
+"""
+JPEG Encoder Module
+JPEG encoding with Jetson hardware acceleration (NVJPEG) when available,
+falling back to libjpeg-turbo (PyTurboJPEG) or OpenCV's CPU encoder.
+"""
+
+import logging
+import threading
+import numpy as np
+import cv2
+
+logger = logging.getLogger(__name__)
+
+try:
+    from nvjpeg import NvJpeg
+    NVJPEG_AVAILABLE = True
+except ImportError:
+    NvJpeg = None
+    NVJPEG_AVAILABLE = False
+
+try:
+    from turbojpeg import TurboJPEG, TJSAMP_420
+    TURBOJPEG_AVAILABLE = True
+except ImportError:
+    TurboJPEG = None
+    TJSAMP_420 = None
+    TURBOJPEG_AVAILABLE = False
+
+
+class JpegEncoder:
+    """
+    JPEG encoder for BGR frames.
+    Uses NVJPEG (nvjpeg-python) on Jetson, PyTurboJPEG if installed and
+    cv2.imencode otherwise.
+    """
+    
+    def __init__(self, backend: str = 'auto', quality: int = 80, reuse_output: bool = False):
+        """
+        Initialize JPEG encoder.
+        
+        Args:
+            backend: 'auto' (best available), 'nvjpeg', 'turbojpeg' or 'cpu'
+            quality: Default JPEG quality (0-100)
+            reuse_output: Encode into one preallocated buffer (TurboJPEG only);
+                each result is then only valid until the next encode() call
+        """
+        self.quality = quality
+        self.reuse_output = reuse_output
+        self._nvjpeg = None
+        self._nvjpeg_lock = threading.Lock()
+        self._turbo = None
+        
+        # Preallocated TurboJPEG output, sized for the worst case per frame shape
+        self._out_buf = None
+        self._out_shape = None
+        
+        # imencode parameter lists, built once per quality
+        self._cv_params = {}
+        
+        if backend in ('auto', 'nvjpeg'):
+            if NVJPEG_AVAILABLE:
+                try:
+                    self._nvjpeg = NvJpeg()
+                except Exception as e:
+                    logger.warning(f"Failed to initialize NVJPEG: {e}")
+            elif backend == 'nvjpeg':
+                logger.warning("NVJPEG requested but nvjpeg module not installed")
+        
+        if not self._nvjpeg and backend in ('auto', 'turbojpeg'):
+            if TURBOJPEG_AVAILABLE:
+                try:
+                    self._turbo = TurboJPEG()
+                except Exception as e:
+                    logger.warning(f"Failed to initialize TurboJPEG: {e}")
+            elif backend == 'turbojpeg':
+                logger.warning("TurboJPEG requested but turbojpeg module not installed")
+        
+        if self._nvjpeg:
+            self.backend = 'nvjpeg'
+        elif self._turbo:
+            self.backend = 'turbojpeg'
+        else:
+            self.backend = 'cpu'
+        logger.info(f"JPEG encoder using {self.backend} backend")
+    
+    def encode(self, frame: np.ndarray, quality: int = None):
+        """
+        Encode a BGR frame as JPEG.
+        
+        Args:
+            frame: Video frame (numpy array in BGR format)
+            quality: JPEG quality (0-100), defaults to the encoder quality
+            
+        Returns:
+            Encoded JPEG as a bytes-like object (bytes or flat uint8 array),
+            or None if encoding failed
+        """
+        if quality is None:
+            quality = self.quality
+        
+        if self._nvjpeg:
+            # One hardware encoder handle, shared by all calling threads
+            with self._nvjpeg_lock:
+                return self._nvjpeg.encode(frame, quality)
+        
+        if self._turbo:
+            if not self.reuse_output:
+                return self._turbo.encode(frame, quality=quality, jpeg_subsample=TJSAMP_420)
+            
+            if frame.shape != self._out_shape:
+                size = self._turbo.buffer_size(frame, TJSAMP_420)
+                self._out_buf = np.empty(size, dtype=np.uint8)
+                self._out_shape = frame.shape
+            
+            _, size = self._turbo.encode(frame, quality=quality, jpeg_subsample=TJSAMP_420,
+                                         dst=self._out_buf)
+            return self._out_buf[:size]
+        
+        params = self._cv_params.get(quality)
+        if params is None:
+            params = self._cv_params[quality] = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+        
+        ok, encoded = cv2.imencode('.jpg', frame, params)
+        if not ok:
+            return None
+        
+        # Flat view of the encoder output, no extra bytes copy
+        return encoded.reshape(-1)
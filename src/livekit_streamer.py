@@ -4,15 +4,78 @@ Handles video streaming to LiveKit servers with telemetry data overlay.
 """
 
 import asyncio
+import concurrent.futures
 import logging
+import struct
+import threading
 import numpy as np
 import cv2
 from typing import Optional, Dict
 from livekit import rtc
-import json
+import orjson
 
 logger = logging.getLogger(__name__)
 
+# Binary telemetry packet: version, flags, timestamp (ns), then float32 metrics
+TELEMETRY_VERSION = 1
+TELEMETRY_STRUCT = struct.Struct('<BBQfffffffff')
+TELEMETRY_FIELDS = (
+    'cpu_usage_percent', 'memory_percent', 'memory_used_mb', 'gpu_usage_percent',
+    'temperature_max', 'camera_fps', 'stream_fps', 'bytes_sent_mb', 'bytes_recv_mb'
+)
+TELEMETRY_FLAGS = ('siyi_connected', 'livekit_connected', 'gpu_available')
+
+
+def encode_telemetry(telemetry_data: Dict) -> bytes:
+    """
+    Pack telemetry into the fixed binary schema.
+    
+    Args:
+        telemetry_data: Dictionary with telemetry information
+        
+    Returns:
+        Packed telemetry packet
+    """
+    flags = 0
+    for bit, name in enumerate(TELEMETRY_FLAGS):
+        if telemetry_data.get(name):
+            flags |= 1 << bit
+    
+    temps = telemetry_data.get('temperatures')
+    temperature_max = max(temps.values()) if temps else 0.0
+    values = [
+        temperature_max if name == 'temperature_max' else telemetry_data.get(name, 0.0)
+        for name in TELEMETRY_FIELDS
+    ]
+    
+    return TELEMETRY_STRUCT.pack(
+        TELEMETRY_VERSION,
+        flags,
+        int(telemetry_data.get('timestamp', 0) * 1e9),
+        *values
+    )
+
+
+def decode_telemetry(packet: bytes) -> Dict:
+    """
+    Unpack a binary telemetry packet produced by encode_telemetry().
+    
+    Args:
+        packet: Packed telemetry packet
+        
+    Returns:
+        Dictionary with telemetry information
+    """
+    version, flags, timestamp_ns, *values = TELEMETRY_STRUCT.unpack(packet)
+    if version != TELEMETRY_VERSION:
+        raise ValueError(f"Unsupported telemetry version: {version}")
+    
+    data = dict(zip(TELEMETRY_FIELDS, values))
+    data['timestamp'] = timestamp_ns / 1e9
+    for bit, name in enumerate(TELEMETRY_FLAGS):
+        data[name] = bool(flags & (1 << bit))
+    return data
+
 
 class LiveKitStreamer:
     """
@@ -36,6 +99,7 @@ class LiveKitStreamer:
         
         # LiveKit objects
         self.room = None
+        self.local_participant = None
         self.video_source = None
         self.video_track = None
         
@@ -45,11 +109,34 @@ class LiveKitStreamer:
         
         # Video settings
         self.video_bitrate = config.get('video_bitrate', 2000000)  # 2 Mbps
+        
+        # Telemetry encoding: 'struct' (binary) or 'json'
+        self.telemetry_format = config.get('telemetry_format', 'struct')
         self.frame_width = 0
         self.frame_height = 0
         
+        # Reusable conversion buffers, allocated in start_streaming()
+        self._i420_bufs = []
+        self._i420_idx = 0
+        self._resize_buf = None
+        self._pub_shape = None
+        self._pub_size = None
+        
         logger.info(f"LiveKit streamer initialized for room: {self.room_name}")
     
+    def _on_participant_connected(self, participant: rtc.RemoteParticipant):
+        """Handle remote participant joining the room."""
+        logger.info(f"Participant connected: {participant.identity}")
+    
+    def _on_participant_disconnected(self, participant: rtc.RemoteParticipant):
+        """Handle remote participant leaving the room."""
+        logger.info(f"Participant disconnected: {participant.identity}")
+    
+    def _on_track_subscribed(self, track: rtc.Track, publication: rtc.RemoteTrackPublication,
+                             participant: rtc.RemoteParticipant):
+        """Handle subscription to a remote track."""
+        logger.info(f"Track subscribed: {track.sid}")
+    
     async def connect(self) -> bool:
         """
         Connect to LiveKit room.
@@ -62,18 +149,9 @@ class LiveKitStreamer:
             self.room = rtc.Room()
             
             # Set up event handlers
-            @self.room.on("participant_connected")
-            def on_participant_connected(participant: rtc.RemoteParticipant):
-                logger.info(f"Participant connected: {participant.identity}")
-            
-            @self.room.on("participant_disconnected")
-            def on_participant_disconnected(participant: rtc.RemoteParticipant):
-                logger.info(f"Participant disconnected: {participant.identity}")
-            
-            @self.room.on("track_subscribed")
-            def on_track_subscribed(track: rtc.Track, publication: rtc.RemoteTrackPublication,
-                                   participant: rtc.RemoteParticipant):
-                logger.info(f"Track subscribed: {track.sid}")
+            self.room.on("participant_connected", self._on_participant_connected)
+            self.room.on("participant_disconnected", self._on_participant_disconnected)
+            self.room.on("track_subscribed", self._on_track_subscribed)
             
             # Generate access token
             from livekit.api import AccessToken, VideoGrants
@@ -93,6 +171,7 @@ class LiveKitStreamer:
             # Connect to room
             logger.info(f"Connecting to LiveKit room: {self.room_name}")
             await self.room.connect(self.url, jwt_token)
+            self.local_participant = self.room.local_participant
             
             self.connected = True
             logger.info("Successfully connected to LiveKit room")
@@ -121,6 +200,17 @@ class LiveKitStreamer:
         try:
             self.frame_width = width
             self.frame_height = height
+            # I420: Y plane followed by quarter-size U and V planes. Three
+            # buffers rotate: one being published, one waiting in the
+            # manager's mailbox and one being converted on another thread.
+            self._i420_bufs = [np.empty((height * 3 // 2, width), dtype=np.uint8)
+                               for _ in range(3)]
+            self._i420_idx = 0
+            self._resize_buf = np.empty((height, width, 3), dtype=np.uint8)
+            
+            # Publish geometry, fixed for the lifetime of the track
+            self._pub_shape = self._resize_buf.shape
+            self._pub_size = (width, height)
             
             # Create video source
             self.video_source = rtc.VideoSource(width, height)
@@ -138,7 +228,7 @@ class LiveKitStreamer:
                 max_framerate=fps
             )
             
-            await self.room.local_participant.publish_track(self.video_track, options)
+            await self.local_participant.publish_track(self.video_track, options)
             
             self.streaming = True
             logger.info(f"Started LiveKit streaming: {width}x{height} @ {fps}fps")
@@ -148,13 +238,50 @@ class LiveKitStreamer:
             logger.error(f"Failed to start streaming: {e}")
             return False
     
-    async def send_frame(self, frame: np.ndarray) -> bool:
+    def convert_frame(self, frame: np.ndarray) -> Optional[rtc.VideoFrame]:
         """
-        Send video frame to LiveKit.
+        Convert a camera frame to a LiveKit video frame.
+        
+        CPU-bound and thread-safe for a single caller, so it can run on a
+        processing thread while the event loop only publishes.
         
         Args:
             frame: Video frame (numpy array in BGR format)
             
+        Returns:
+            VideoFrame ready for publish_frame(), or None if not streaming
+        """
+        if not self.streaming or not self.video_source:
+            return None
+        
+        # Resize first (on 3-channel BGR) so only publish-size pixels are converted
+        if frame.shape != self._pub_shape:
+            cv2.resize(frame, self._pub_size,
+                       dst=self._resize_buf, interpolation=cv2.INTER_LINEAR)
+            frame = self._resize_buf
+        
+        # Convert BGR straight to I420, the encoder's native input, so
+        # LiveKit does not need its own RGBA->I420 pass
+        i420 = self._i420_bufs[self._i420_idx]
+        self._i420_idx = (self._i420_idx + 1) % len(self._i420_bufs)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2YUV_I420, dst=i420)
+        
+        # Create VideoFrame over the buffer (no tobytes() copy)
+        width, height = self._pub_size
+        return rtc.VideoFrame(
+            width=width,
+            height=height,
+            type=rtc.VideoBufferType.I420,
+            data=memoryview(i420).cast('B')
+        )
+    
+    def publish_frame(self, video_frame: rtc.VideoFrame) -> bool:
+        """
+        Publish an already converted frame to the video source.
+        
+        Args:
+            video_frame: Frame from convert_frame()
+            
         Returns:
             True if frame sent successfully
         """
@@ -162,30 +289,32 @@ class LiveKitStreamer:
             return False
         
         try:
-            # Convert BGR to RGB (OpenCV uses BGR, LiveKit expects RGB)
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
-            # Resize if necessary
-            if frame.shape[1] != self.frame_width or frame.shape[0] != self.frame_height:
-                frame_rgb = cv2.resize(frame_rgb, (self.frame_width, self.frame_height))
-            
-            # Create VideoFrame
-            video_frame = rtc.VideoFrame(
-                width=self.frame_width,
-                height=self.frame_height,
-                type=rtc.VideoBufferType.RGBA,
-                data=frame_rgb.tobytes()
-            )
-            
-            # Capture frame to video source
             self.video_source.capture_frame(video_frame)
-            
             return True
-            
         except Exception as e:
             logger.error(f"Error sending frame: {e}")
             return False
     
+    async def send_frame(self, frame: np.ndarray) -> bool:
+        """
+        Send video frame to LiveKit.
+        
+        Args:
+            frame: Video frame (numpy array in BGR format)
+            
+        Returns:
+            True if frame sent successfully
+        """
+        try:
+            video_frame = self.convert_frame(frame)
+        except Exception as e:
+            logger.error(f"Error converting frame: {e}")
+            return False
+        
+        if video_frame is None:
+            return False
+        return self.publish_frame(video_frame)
+    
     async def send_telemetry(self, telemetry_data: Dict) -> bool:
         """
         Send telemetry data via data channel.
@@ -200,15 +329,20 @@ class LiveKitStreamer:
             return False
         
         try:
-            # Serialize telemetry data
-            data_str = json.dumps(telemetry_data)
-            data_bytes = data_str.encode('utf-8')
+            # Serialize telemetry data (fixed binary schema, or JSON on a debug topic)
+            if self.telemetry_format == 'struct':
+                data_bytes = encode_telemetry(telemetry_data)
+                topic = "telemetry"
+            else:
+                data_bytes = orjson.dumps(telemetry_data, option=orjson.OPT_SERIALIZE_NUMPY)
+                topic = "telemetry_debug"
             
-            # Publish data via data channel
-            await self.room.local_participant.publish_data(
+            # Publish via unordered, unreliable data channel: telemetry is
+            # idempotent, so avoid head-of-line blocking on retransmits
+            await self.local_participant.publish_data(
                 data_bytes,
-                kind=rtc.DataPacketKind.RELIABLE,
-                topic="telemetry"
+                kind=rtc.DataPacketKind.LOSSY,
+                topic=topic
             )
             
             return True
@@ -224,7 +358,7 @@ class LiveKitStreamer:
             self.streaming = False
             
             if self.video_track and self.room:
-                await self.room.local_participant.unpublish_track(self.video_track.sid)
+                await self.local_participant.unpublish_track(self.video_track.sid)
             
             self.video_track = None
             self.video_source = None
@@ -239,6 +373,7 @@ class LiveKitStreamer:
             await self.room.disconnect()
             self.connected = False
             self.room = None
+            self.local_participant = None
             logger.info("Disconnected from LiveKit")
     
     async def __aenter__(self):
@@ -269,11 +404,56 @@ class LiveKitStreamManager:
         self.loop = None
         self.running = False
         self.task = None
+        self.thread = None
+        self._stop_event = None
+        
+        # Single-slot frame mailbox: newer frames overwrite unpublished ones
+        self._latest_frame = None
+        self._frame_event = None
+        
+        # Latest telemetry snapshot, published by a single pump at a fixed cadence
+        self.telemetry_interval = 1.0 / config.get('telemetry_rate_hz', 10)
+        self._latest_telemetry = None
+        self._telemetry_lock = threading.Lock()
+        
+    async def _telemetry_pump(self):
+        """Publish the most recent telemetry snapshot once per interval."""
+        while True:
+            await asyncio.sleep(self.telemetry_interval)
+            
+            with self._telemetry_lock:
+                telemetry_data, self._latest_telemetry = self._latest_telemetry, None
+            
+            if telemetry_data is not None:
+                await self.streamer.send_telemetry(telemetry_data)
+    
+    async def _frame_worker(self):
+        """Publish the latest frame whenever a new one arrives."""
+        while True:
+            await self._frame_event.wait()
+            self._frame_event.clear()
+            
+            video_frame, self._latest_frame = self._latest_frame, None
+            if video_frame is not None:
+                self.streamer.publish_frame(video_frame)
+    
+    def _enqueue_frame(self, video_frame: rtc.VideoFrame):
+        """Store a converted frame on the loop thread, replacing any unpublished one."""
+        if self._frame_event is None:
+            return
         
-    def start(self) -> bool:
+        self._latest_frame = video_frame
+        self._frame_event.set()
+    
+    def start(self, width: int = 1920, height: int = 1080, fps: int = 30) -> bool:
         """
-        Start the stream manager.
+        Start the stream manager and begin publishing video once connected.
         
+        Args:
+            width: Published video width
+            height: Published video height
+            fps: Published frames per second
+            
         Returns:
             True if started successfully
         """
@@ -285,34 +465,44 @@ class LiveKitStreamManager:
             # Run connection in loop
             self.running = True
             
+            # Resolved from the loop thread once the connection attempt finishes
+            ready = concurrent.futures.Future()
+            
             async def run_streamer():
-                await self.streamer.connect()
-                while self.running:
-                    await asyncio.sleep(0.1)
+                self._stop_event = asyncio.Event()
+                self._frame_event = asyncio.Event()
+                frame_task = asyncio.create_task(self._frame_worker())
+                telemetry_task = asyncio.create_task(self._telemetry_pump())
+                try:
+                    if await self.streamer.connect():
+                        await self.streamer.start_streaming(width, height, fps)
+                finally:
+                    ready.set_result(self.streamer.connected)
+                await self._stop_event.wait()
+                frame_task.cancel()
+                telemetry_task.cancel()
                 await self.streamer.disconnect()
             
             # Start event loop in background thread
-            import threading
-            
             def run_loop():
                 asyncio.set_event_loop(self.loop)
                 self.loop.run_until_complete(run_streamer())
             
-            thread = threading.Thread(target=run_loop, daemon=True)
-            thread.start()
+            self.thread = threading.Thread(target=run_loop, daemon=True)
+            self.thread.start()
             
             # Wait for connection
-            import time
-            timeout = 5.0
-            start_time = time.time()
-            while not self.streamer.connected and time.time() - start_time < timeout:
-                time.sleep(0.1)
+            try:
+                connected = ready.result(timeout=5.0)
+            except concurrent.futures.TimeoutError:
+                logger.error("Failed to connect within timeout")
+                return False
             
-            if self.streamer.connected:
+            if connected:
                 logger.info("LiveKit stream manager started")
                 return True
             else:
-                logger.error("Failed to connect within timeout")
+                logger.error("Failed to connect to LiveKit")
                 return False
                 
         except Exception as e:
@@ -323,6 +513,9 @@ class LiveKitStreamManager:
         """
         Send video frame (synchronous wrapper).
         
+        Color conversion runs on the calling thread; the event loop only
+        publishes the converted frame.
+        
         Args:
             frame: Video frame
             
@@ -333,10 +526,12 @@ class LiveKitStreamManager:
             return False
         
         try:
-            asyncio.run_coroutine_threadsafe(
-                self.streamer.send_frame(frame),
-                self.loop
-            )
+            video_frame = self.streamer.convert_frame(frame)
+            if video_frame is None:
+                return False
+            
+            # Hand off to the mailbox; never accumulates pending frames
+            self.loop.call_soon_threadsafe(self._enqueue_frame, video_frame)
             return True
         except Exception as e:
             logger.error(f"Error sending frame: {e}")
@@ -346,32 +541,34 @@ class LiveKitStreamManager:
         """
         Send telemetry data (synchronous wrapper).
         
+        Only the latest snapshot is kept; the telemetry pump on the event
+        loop publishes it at the configured cadence.
+        
         Args:
             telemetry_data: Telemetry dictionary
             
         Returns:
-            True if sent successfully
+            True if queued for sending
         """
         if not self.loop or not self.streamer:
             return False
         
-        try:
-            asyncio.run_coroutine_threadsafe(
-                self.streamer.send_telemetry(telemetry_data),
-                self.loop
-            )
-            return True
-        except Exception as e:
-            logger.error(f"Error sending telemetry: {e}")
-            return False
+        with self._telemetry_lock:
+            self._latest_telemetry = telemetry_data
+        return True
     
     def stop(self):
         """Stop the stream manager."""
         logger.info("Stopping LiveKit stream manager")
         self.running = False
         
-        if self.loop:
-            self.loop.stop()
+        # Let run_streamer disconnect cleanly on its own loop
+        if self.loop and self._stop_event and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._stop_event.set)
+        
+        if self.thread:
+            self.thread.join(timeout=5.0)
+            self.thread = None
         
         logger.info("LiveKit stream manager stopped")
 
@@ -4,6 +4,7 @@ Handles communication with SIYI MK15 handheld ground station for video transmiss
 Implements SIYI SDK protocol for gimbal control and video streaming.
 """
 
+import array
 import socket
 import struct
 import threading
@@ -13,8 +14,50 @@ from typing import Optional, Tuple
 import numpy as np
 import cv2
 
+try:
+    from .jpeg_encoder import JpegEncoder
+    from .udp_sender import UdpFragmentSender
+except ImportError:
+    from jpeg_encoder import JpegEncoder
+    from udp_sender import UdpFragmentSender
+
 logger = logging.getLogger(__name__)
 
+# Jetson hardware encoder; {host}, {port} and {bitrate} are filled from config
+DEFAULT_H264_PIPELINE = (
+    "appsrc ! video/x-raw, format=BGR ! videoconvert ! video/x-raw, format=BGRx ! "
+    "nvvidconv ! video/x-raw(memory:NVMM), format=NV12 ! "
+    "nvv4l2h264enc bitrate={bitrate} insert-sps-pps=true idrinterval=30 ! "
+    "h264parse ! rtph264pay config-interval=1 pt=96 ! "
+    "udpsink host={host} port={port} sync=false async=false"
+)
+
+try:
+    import crcmod.predefined
+    # CRC-16/ARC: reflected poly 0xA001, init 0, no final xor (C extension)
+    _crc16_fast = crcmod.predefined.mkPredefinedCrcFun('crc-16')
+    CRCMOD_AVAILABLE = True
+except ImportError:
+    _crc16_fast = None
+    CRCMOD_AVAILABLE = False
+
+
+def _build_crc16_table(poly: int = 0xA001) -> array.array:
+    """Build the 256-entry lookup table for the reflected CRC16 polynomial."""
+    table = array.array('H')
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            if crc & 1:
+                crc = (crc >> 1) ^ poly
+            else:
+                crc >>= 1
+        table.append(crc)
+    return table
+
+
+_CRC16_TABLE = _build_crc16_table()
+
 
 class SIYIProtocol:
     """SIYI SDK Protocol implementation."""
@@ -35,17 +78,29 @@ class SIYIProtocol:
     STX1 = 0x66
     STX2 = 0xCC
     
+    # Header: STX1(1) + STX2(1) + CTRL(1) + Data_len(2) + SEQ(2) + CMD_ID(1)
+    HEADER = struct.Struct('<BBBHHB')
+    CRC = struct.Struct('<H')
+    GIMBAL_SPEED = struct.Struct('<bb')
+    
     @staticmethod
-    def calc_crc16(data: bytes) -> int:
-        """Calculate CRC16 checksum."""
-        crc = 0
+    def calc_crc16(data: bytes, crc: int = 0) -> int:
+        """
+        Calculate CRC16 checksum (crcmod if installed, else byte-wise table lookup).
+        
+        Args:
+            data: Bytes to checksum
+            crc: Starting value; pass the CRC of a preceding prefix to continue it
+            
+        Returns:
+            CRC16 value
+        """
+        if _crc16_fast:
+            return _crc16_fast(data, crc)
+        
+        tbl = _CRC16_TABLE
         for byte in data:
-            crc ^= byte
-            for _ in range(8):
-                if crc & 1:
-                    crc = (crc >> 1) ^ 0xA001
-                else:
-                    crc >>= 1
+            crc = (crc >> 8) ^ tbl[(crc ^ byte) & 0xFF]
         return crc
     
     @classmethod
@@ -61,26 +116,27 @@ class SIYIProtocol:
             Complete packet with header, CRC, and data
         """
         data_len = len(data)
+        body_len = cls.HEADER.size + data_len
         
-        # Header: STX1(1) + STX2(1) + CTRL(1) + Data_len(2) + SEQ(2) + CMD_ID(1) + DATA(n)
+        # Header + DATA(n) + CRC(2), packed in place into one buffer
         ctrl = 0
         seq = 0
         
-        header = struct.pack('<BBBHHB',
-                           cls.STX1,
-                           cls.STX2,
-                           ctrl,
-                           data_len,
-                           seq,
-                           cmd_id)
-        
-        packet = header + data
+        packet = bytearray(body_len + cls.CRC.size)
+        cls.HEADER.pack_into(packet, 0,
+                             cls.STX1,
+                             cls.STX2,
+                             ctrl,
+                             data_len,
+                             seq,
+                             cmd_id)
+        packet[cls.HEADER.size:body_len] = data
         
         # Calculate CRC16 (low byte, high byte)
-        crc = cls.calc_crc16(packet)
-        crc_bytes = struct.pack('<H', crc)
+        crc = cls.calc_crc16(memoryview(packet)[:body_len])
+        cls.CRC.pack_into(packet, body_len, crc)
         
-        return packet + crc_bytes
+        return bytes(packet)
     
     @classmethod
     def parse_packet(cls, data: bytes) -> Optional[Tuple[int, bytes]]:
@@ -101,10 +157,7 @@ class SIYIProtocol:
             return None
         
         # Extract header
-        ctrl = data[2]
-        data_len = struct.unpack('<H', data[3:5])[0]
-        seq = struct.unpack('<H', data[5:7])[0]
-        cmd_id = data[7]
+        _, _, ctrl, data_len, seq, cmd_id = cls.HEADER.unpack_from(data)
         
         # Verify packet length
         expected_len = 8 + data_len + 2  # header + data + crc
@@ -114,7 +167,7 @@ class SIYIProtocol:
         payload = data[8:8+data_len]
         
         # Verify CRC
-        crc_received = struct.unpack('<H', data[8+data_len:8+data_len+2])[0]
+        crc_received = cls.CRC.unpack_from(data, 8+data_len)[0]
         crc_calculated = cls.calc_crc16(data[:8+data_len])
         
         if crc_received != crc_calculated:
@@ -141,9 +194,15 @@ class SIYIMKController:
         self.transmitter_ip = config.get('transmitter_ip', '192.168.144.25')
         self.video_port = config.get('video_output_port', 5600)
         self.control_port = config.get('control_port', 37260)
+        self.send_buffer_size = config.get('send_buffer_size', 4 * 1024 * 1024)
+        
+        # Destination addresses, resolved once in connect()
+        self.video_addr = (self.transmitter_ip, self.video_port)
+        self.control_addr = (self.transmitter_ip, self.control_port)
         
         # Sockets
         self.video_socket = None
+        self.video_sender = None
         self.control_socket = None
         
         # State
@@ -153,6 +212,25 @@ class SIYIMKController:
         # Video streaming
         self.video_thread = None
         self.video_queue = None
+        # Each frame is sent before the next is encoded, so the output buffer is reused
+        self.jpeg_encoder = JpegEncoder(config.get('jpeg_encoder', 'auto'), reuse_output=True)
+        
+        # Hardware H.264 path (GStreamer), opened on the first frame
+        self.video_codec = config.get('video_codec', 'mjpeg')
+        self.h264_pipeline = config.get('h264_pipeline', DEFAULT_H264_PIPELINE)
+        self.h264_bitrate = config.get('h264_bitrate', 4000000)
+        self.video_fps = config.get('video_fps', 30)
+        self.h264_writer = None
+        
+        # Fixed zero-payload command packets, built once
+        self._pkt_heartbeat = SIYIProtocol.build_packet(SIYIProtocol.CMD_ACQUIRE_FW_VERSION)
+        self._pkt_center = SIYIProtocol.build_packet(SIYIProtocol.CMD_CENTER)
+        
+        # Gimbal speed packets: constant header, CRC continued from it per payload
+        self._hdr_gimbal_speed = SIYIProtocol.HEADER.pack(
+            SIYIProtocol.STX1, SIYIProtocol.STX2, 0,
+            SIYIProtocol.GIMBAL_SPEED.size, 0, SIYIProtocol.CMD_GIMBAL_SPEED)
+        self._crc_gimbal_speed = SIYIProtocol.calc_crc16(self._hdr_gimbal_speed)
         
         logger.info(f"SIYI MK15 Controller initialized for {self.transmitter_ip}")
     
@@ -164,9 +242,20 @@ class SIYIMKController:
             True if connected successfully
         """
         try:
+            # Resolve the transmitter once; every sendto reuses these tuples
+            ip = socket.gethostbyname(self.transmitter_ip)
+            self.video_addr = (ip, self.video_port)
+            self.control_addr = (ip, self.control_port)
+            
             # Create video streaming socket (UDP)
             self.video_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            logger.info(f"Video socket created for {self.transmitter_ip}:{self.video_port}")
+            
+            # Room for a whole frame's fragment burst (kernel caps at net.core.wmem_max)
+            self.video_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.send_buffer_size)
+            sndbuf = self.video_socket.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF)
+            
+            self.video_sender = UdpFragmentSender(self.video_socket, self.video_addr, 1400)  # MTU consideration
+            logger.info(f"Video socket created for {self.transmitter_ip}:{self.video_port} (sndbuf {sndbuf} bytes)")
             
             # Create control socket (UDP)
             self.control_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -188,11 +277,38 @@ class SIYIMKController:
     def _send_heartbeat(self):
         """Send heartbeat/connection packet to SIYI."""
         try:
-            packet = SIYIProtocol.build_packet(SIYIProtocol.CMD_ACQUIRE_FW_VERSION)
-            self.control_socket.sendto(packet, (self.transmitter_ip, self.control_port))
+            self.control_socket.sendto(self._pkt_heartbeat, self.control_addr)
         except Exception as e:
             logger.debug(f"Heartbeat send error: {e}")
     
+    def _open_h264_writer(self, width: int, height: int) -> bool:
+        """
+        Open the GStreamer H.264/RTP writer for the given frame size.
+        
+        Args:
+            width: Frame width
+            height: Frame height
+            
+        Returns:
+            True if the pipeline opened
+        """
+        pipeline = self.h264_pipeline.format(
+            host=self.transmitter_ip,
+            port=self.video_port,
+            bitrate=self.h264_bitrate
+        )
+        
+        writer = cv2.VideoWriter(pipeline, cv2.CAP_GSTREAMER, 0,
+                                 float(self.video_fps), (width, height), True)
+        if not writer.isOpened():
+            logger.error("Failed to open H.264 pipeline, falling back to MJPEG")
+            self.video_codec = 'mjpeg'
+            return False
+        
+        self.h264_writer = writer
+        logger.info(f"H.264 stream to {self.transmitter_ip}:{self.video_port}: {width}x{height}")
+        return True
+    
     def send_video_frame(self, frame: np.ndarray, quality: int = 80) -> bool:
         """
         Send video frame to SIYI transmitter.
@@ -208,30 +324,19 @@ class SIYIMKController:
             return False
         
         try:
-            # Encode frame as JPEG
-            encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
-            _, encoded = cv2.imencode('.jpg', frame, encode_param)
+            # Hardware H.264: encoding and RTP packetization run in the pipeline
+            if self.video_codec == 'h264':
+                if self.h264_writer or self._open_h264_writer(frame.shape[1], frame.shape[0]):
+                    self.h264_writer.write(frame)
+                    return True
             
-            # Send via UDP (may need to fragment for large frames)
-            frame_data = encoded.tobytes()
+            # Encode frame as JPEG (NVJPEG on Jetson when available)
+            frame_data = self.jpeg_encoder.encode(frame, quality)
+            if frame_data is None:
+                return False
             
-            # SIYI expects H.264 stream, but for simplicity we'll send MJPEG
-            # In production, use hardware encoding to H.264
-            
-            max_packet_size = 1400  # MTU consideration
-            
-            if len(frame_data) <= max_packet_size:
-                # Send as single packet
-                self.video_socket.sendto(frame_data, (self.transmitter_ip, self.video_port))
-            else:
-                # Fragment into multiple packets
-                num_packets = (len(frame_data) + max_packet_size - 1) // max_packet_size
-                
-                for i in range(num_packets):
-                    start = i * max_packet_size
-                    end = min((i + 1) * max_packet_size, len(frame_data))
-                    packet = frame_data[start:end]
-                    self.video_socket.sendto(packet, (self.transmitter_ip, self.video_port))
+            # Send via UDP, fragmented; one sendmmsg() per frame on Linux
+            self.video_sender.send(frame_data)
             
             return True
             
@@ -256,7 +361,8 @@ class SIYIMKController:
             # Format telemetry data (implement based on SIYI protocol)
             # This is a placeholder - actual implementation depends on SIYI specs
             
-            logger.debug(f"Telemetry: {telemetry_data}")
+            # Lazy formatting: the dict is only rendered when debug logging is on
+            logger.debug("Telemetry: %s", telemetry_data)
             return True
             
         except Exception as e:
@@ -282,11 +388,12 @@ class SIYIMKController:
             yaw_speed = max(-100, min(100, yaw_speed))
             pitch_speed = max(-100, min(100, pitch_speed))
             
-            # Build gimbal speed control packet
-            data = struct.pack('<bb', yaw_speed, pitch_speed)
-            packet = SIYIProtocol.build_packet(SIYIProtocol.CMD_GIMBAL_SPEED, data)
+            # Build gimbal speed control packet (only the 2-byte payload is CRC'd here)
+            data = SIYIProtocol.GIMBAL_SPEED.pack(yaw_speed, pitch_speed)
+            crc = SIYIProtocol.calc_crc16(data, self._crc_gimbal_speed)
+            packet = self._hdr_gimbal_speed + data + SIYIProtocol.CRC.pack(crc)
             
-            self.control_socket.sendto(packet, (self.transmitter_ip, self.control_port))
+            self.control_socket.sendto(packet, self.control_addr)
             return True
             
         except Exception as e:
@@ -299,8 +406,7 @@ class SIYIMKController:
             return False
         
         try:
-            packet = SIYIProtocol.build_packet(SIYIProtocol.CMD_CENTER)
-            self.control_socket.sendto(packet, (self.transmitter_ip, self.control_port))
+            self.control_socket.sendto(self._pkt_center, self.control_addr)
             logger.info("Gimbal centered")
             return True
             
@@ -313,9 +419,14 @@ class SIYIMKController:
         logger.info("Disconnecting from SIYI MK15")
         self.connected = False
         
+        if self.h264_writer:
+            self.h264_writer.release()
+            self.h264_writer = None
+        
         if self.video_socket:
             self.video_socket.close()
             self.video_socket = None
+            self.video_sender = None
         
         if self.control_socket:
             self.control_socket.close()
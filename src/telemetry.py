@@ -3,16 +3,36 @@ Telemetry Module
 Collects system telemetry data from Jetson device including CPU, GPU, memory, temperature, and network stats.
 """
 
+import os
+import glob
 import psutil
 import time
 import logging
 import threading
-from typing import Dict, Optional, Callable
+from typing import Dict, List, Optional, Callable, Tuple
 import subprocess
 import re
 
+try:
+    from .worker import set_thread_scheduling
+except ImportError:
+    from worker import set_thread_scheduling
+
 logger = logging.getLogger(__name__)
 
+# Seconds between re-reads of each metric (0 = every update). Slow-changing
+# metrics reuse their last reading in between.
+DEFAULT_METRIC_INTERVALS = {
+    'cpu_usage': 0.0,
+    'memory_usage': 1.0,
+    'gpu_usage': 0.0,
+    'temperature': 1.0,
+    'network_stats': 1.0,
+}
+
+# tegrastats fields, matched on the raw (undecoded) output lines
+_GR3D_RE = re.compile(rb'GR3D_FREQ (\d+)%')
+
 
 class JetsonTelemetry:
     """
@@ -34,124 +54,298 @@ class JetsonTelemetry:
             'temperature', 'network_stats', 'camera_fps'
         ])
         
+        # Collection thread scheduling (Linux only)
+        self.thread_cpu = config.get('thread_cpu')
+        self.thread_nice = config.get('thread_nice', 0)
+        
         # State
         self.running = False
         self.telemetry_thread = None
+        self._stop_event = threading.Event()
         self.current_data = {}
-        self.callbacks = []
+        
+        # Registered callbacks: replaced (never mutated) so the loop can iterate lock-free
+        self.callbacks = ()
+        self._callbacks_lock = threading.Lock()
         
         # Custom metrics
         self.camera_fps = 0.0
         self.stream_fps = 0.0
         
+        # Boot-invariant values, read once
+        self._cpu_count = psutil.cpu_count()
+        self._mem_total_mb = psutil.virtual_memory().total / (1024 * 1024)
+        self._thermal_zones = self._discover_thermal_zones()
+        self._thermal_fds = []
+        
+        # Per-metric sampling: collector, interval, last reading and its time
+        self.metric_intervals = {**DEFAULT_METRIC_INTERVALS, **config.get('metric_intervals', {})}
+        collectors = {
+            'cpu_usage': self._get_cpu_usage,
+            'memory_usage': self._get_memory_usage,
+            'gpu_usage': self._get_gpu_usage,
+            'temperature': lambda: {'temperatures': self._get_temperature()},
+            'network_stats': self._get_network_stats,
+        }
+        self._collectors = [(m, c) for m, c in collectors.items() if m in self.metrics]
+        self._metric_cache = {}
+        self._metric_sampled = {}
+        
+        # Long-running tegrastats process, started with collection
+        self._tegra_proc = None
+        self._tegra_thread = None
+        self._gpu_sample = {
+            'gpu_usage_percent': 0,
+            'gpu_available': False,
+            'note': 'GPU monitoring not available'
+        }
+        
         logger.info(f"Telemetry collector initialized (rate: {self.rate_hz} Hz)")
     
     def _get_cpu_usage(self) -> Dict:
         """Get CPU usage statistics."""
         try:
-            cpu_percent = psutil.cpu_percent(interval=0.1, percpu=True)
+            # Non-blocking: usage since the previous call (one loop interval)
+            cpu_percent = psutil.cpu_percent(interval=None, percpu=True)
             avg_cpu = sum(cpu_percent) / len(cpu_percent)
             
             return {
-                'cpu_usage_percent': round(avg_cpu, 2),
-                'cpu_per_core': [round(x, 2) for x in cpu_percent],
-                'cpu_count': len(cpu_percent)
+                'cpu_usage_percent': avg_cpu,
+                'cpu_per_core': cpu_percent,
+                'cpu_count': self._cpu_count
             }
         except Exception as e:
             logger.error(f"Error getting CPU usage: {e}")
             return {}
     
+    def _read_meminfo(self) -> Optional[Dict]:
+        """
+        Read memory and swap figures from a single /proc/meminfo pass.
+        Uses the same formulas as psutil 5.9 virtual_memory()/swap_memory(),
+        which read /proc/meminfo and /proc/vmstat separately.
+        
+        Returns:
+            Dict of byte counts and percentages, or None if /proc is unavailable
+        """
+        try:
+            with open('/proc/meminfo', 'rb') as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return None
+        
+        # "MemTotal:  7999000 kB" -> {b'MemTotal': 7999000 * 1024}
+        info = {}
+        for line in lines:
+            name, _, value = line.partition(b':')
+            info[name] = int(value.split()[0]) * 1024
+        
+        total = info[b'MemTotal']
+        free = info[b'MemFree']
+        buffers = info.get(b'Buffers', 0)
+        cached = info.get(b'Cached', 0) + info.get(b'SReclaimable', 0)
+        available = info.get(b'MemAvailable', free + buffers + cached)
+        used = total - free - cached - buffers
+        if used < 0:
+            used = total - free
+        
+        swap_total = info.get(b'SwapTotal', 0)
+        swap_used = swap_total - info.get(b'SwapFree', 0)
+        
+        return {
+            'total': total,
+            'used': used,
+            'percent': (total - available) / total * 100 if total else 0.0,
+            'swap_total': swap_total,
+            'swap_used': swap_used,
+            'swap_percent': swap_used / swap_total * 100 if swap_total else 0.0
+        }
+    
     def _get_memory_usage(self) -> Dict:
         """Get memory usage statistics."""
         try:
-            mem = psutil.virtual_memory()
-            swap = psutil.swap_memory()
+            mem = self._read_meminfo()
+            if mem is None:
+                # No /proc (non-Linux): fall back to psutil
+                vm = psutil.virtual_memory()
+                swap = psutil.swap_memory()
+                mem = {
+                    'total': vm.total, 'used': vm.used, 'percent': vm.percent,
+                    'swap_total': swap.total, 'swap_used': swap.used, 'swap_percent': swap.percent
+                }
             
             return {
-                'memory_total_mb': round(mem.total / (1024 * 1024), 2),
-                'memory_used_mb': round(mem.used / (1024 * 1024), 2),
-                'memory_percent': round(mem.percent, 2),
-                'swap_total_mb': round(swap.total / (1024 * 1024), 2),
-                'swap_used_mb': round(swap.used / (1024 * 1024), 2),
-                'swap_percent': round(swap.percent, 2)
+                'memory_total_mb': self._mem_total_mb,
+                'memory_used_mb': mem['used'] / (1024 * 1024),
+                'memory_percent': mem['percent'],
+                'swap_total_mb': mem['swap_total'] / (1024 * 1024),
+                'swap_used_mb': mem['swap_used'] / (1024 * 1024),
+                'swap_percent': mem['swap_percent']
             }
         except Exception as e:
             logger.error(f"Error getting memory usage: {e}")
             return {}
     
-    def _get_gpu_usage(self) -> Dict:
-        """Get GPU usage statistics (Jetson-specific)."""
+    def _start_tegrastats(self):
+        """Launch tegrastats once; a reader thread parses each line it prints."""
+        interval_ms = max(1, int(1000 / self.rate_hz))
+        
         try:
-            # Try to read from tegrastats or similar Jetson-specific tools
-            # For now, use a simple approach
-            
-            # Check if jetson-stats is available
+            self._tegra_proc = subprocess.Popen(
+                ['tegrastats', '--interval', str(interval_ms)],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL
+            )
+        except (FileNotFoundError, PermissionError) as e:
+            # tegrastats not available, GPU metrics stay at their defaults
+            logger.warning(f"tegrastats not available: {e}")
+            self._tegra_proc = None
+            return
+        
+        self._tegra_thread = threading.Thread(target=self._tegrastats_reader, daemon=True)
+        self._tegra_thread.start()
+    
+    def _stop_tegrastats(self):
+        """Terminate the tegrastats process and its reader thread."""
+        if self._tegra_proc:
+            self._tegra_proc.terminate()
             try:
-                result = subprocess.run(
-                    ['tegrastats', '--interval', '100', '--stop'],
-                    capture_output=True,
-                    text=True,
-                    timeout=1
-                )
-                
-                # Parse tegrastats output
-                # Format varies, this is a basic parser
-                output = result.stdout
-                
-                gpu_match = re.search(r'GR3D_FREQ (\d+)%', output)
-                gpu_percent = int(gpu_match.group(1)) if gpu_match else 0
-                
-                return {
-                    'gpu_usage_percent': gpu_percent,
-                    'gpu_available': True
-                }
-                
-            except (subprocess.TimeoutExpired, FileNotFoundError):
-                # tegrastats not available, try alternative methods
-                return {
-                    'gpu_usage_percent': 0,
-                    'gpu_available': False,
-                    'note': 'GPU monitoring not available'
-                }
-                
+                self._tegra_proc.wait(timeout=1.0)
+            except subprocess.TimeoutExpired:
+                self._tegra_proc.kill()
+            self._tegra_proc = None
+        
+        if self._tegra_thread:
+            self._tegra_thread.join(timeout=1.0)
+            self._tegra_thread = None
+    
+    def _tegrastats_reader(self):
+        """Read tegrastats output until the process exits."""
+        try:
+            for line in self._tegra_proc.stdout:
+                self._parse_tegrastats(line)
         except Exception as e:
-            logger.error(f"Error getting GPU usage: {e}")
-            return {}
+            logger.error(f"Error reading tegrastats: {e}")
+    
+    def _parse_tegrastats(self, line: bytes):
+        """
+        Parse one tegrastats line into the cached GPU sample.
+        
+        Args:
+            line: One line of tegrastats output
+        """
+        # Format varies, this is a basic parser
+        gpu_match = _GR3D_RE.search(line)
+        gpu_percent = int(gpu_match.group(1)) if gpu_match else 0
+        
+        # Replaced whole, so readers never see a partial update
+        self._gpu_sample = {
+            'gpu_usage_percent': gpu_percent,
+            'gpu_available': True
+        }
+    
+    def _get_gpu_usage(self) -> Dict:
+        """Get GPU usage statistics (Jetson-specific), from the latest tegrastats line."""
+        return self._gpu_sample
+    
+    def _discover_thermal_zones(self) -> List[Tuple[str, str]]:
+        """
+        Find temperature sensor files and their keys (fixed after boot).
+        
+        Mirrors psutil.sensors_temperatures(): hwmon sensors if the host has
+        any, otherwise the thermal zones, with the same keys as before.
+        
+        Returns:
+            List of (key, temp_file) tuples
+        """
+        zones = []
+        
+        # hwmon sensors, e.g. coretemp on x86 hosts
+        basenames = glob.glob('/sys/class/hwmon/hwmon*/temp*_*')
+        basenames.extend(glob.glob('/sys/class/hwmon/hwmon*/device/temp*_*'))
+        basenames = sorted({x.split('_')[0] for x in basenames})
+        
+        for base in basenames:
+            temp_file = base + '_input'
+            try:
+                with open(os.path.join(os.path.dirname(base), 'name'), 'r') as f:
+                    unit_name = f.read().strip()
+            except OSError:
+                continue
+            
+            label = ''
+            try:
+                with open(base + '_label', 'r') as f:
+                    label = f.read().strip()
+            except OSError:
+                pass
+            
+            if os.path.exists(temp_file):
+                zones.append((f"{unit_name}_{label}" if label else unit_name, temp_file))
+        
+        if basenames:
+            return zones
+        
+        # No hwmon sensors (Jetson): thermal zones, keyed by zone type
+        thermal_path = '/sys/class/thermal'
+        
+        for i in range(10):  # Check first 10 thermal zones
+            temp_file = f'{thermal_path}/thermal_zone{i}/temp'
+            type_file = f'{thermal_path}/thermal_zone{i}/type'
+            
+            if not os.path.exists(temp_file):
+                continue
+            
+            zone_type = f'zone{i}'
+            try:
+                with open(type_file, 'r') as f:
+                    zone_type = f.read().strip()
+            except OSError:
+                pass
+            
+            zones.append((zone_type, temp_file))
+        
+        return zones
+    
+    def _open_thermal_zones(self):
+        """Open each thermal zone temp file once for repeated pread()."""
+        if self._thermal_fds:
+            return  # Still open from a previous run
+        
+        for zone_type, temp_file in self._thermal_zones:
+            try:
+                self._thermal_fds.append((zone_type, os.open(temp_file, os.O_RDONLY)))
+            except OSError as e:
+                logger.warning(f"Cannot open {temp_file}: {e}")
+    
+    def _close_thermal_zones(self):
+        """Close the thermal zone file descriptors."""
+        for _, fd in self._thermal_fds:
+            os.close(fd)
+        self._thermal_fds = []
     
     def _get_temperature(self) -> Dict:
         """Get temperature readings (Jetson-specific)."""
         try:
             temps = {}
             
-            # Try to read thermal zones
-            try:
+            if self._thermal_fds:
+                # hwmon/thermal zone temp files, held open while collecting: one pread each
+                for zone_type, fd in self._thermal_fds:
+                    try:
+                        temp = int(os.pread(fd, 16, 0)) / 1000.0  # Convert millidegrees to degrees
+                    except (OSError, ValueError):
+                        continue  # Zone disabled or unreadable right now
+                    
+                    temps[zone_type] = temp
+            
+            elif hasattr(psutil, 'sensors_temperatures'):
+                # No sensor files found, fall back to psutil
                 thermal_zones = psutil.sensors_temperatures()
                 
                 for zone_name, readings in thermal_zones.items():
                     for reading in readings:
                         key = f"{zone_name}_{reading.label}" if reading.label else zone_name
-                        temps[key] = round(reading.current, 2)
-                        
-            except AttributeError:
-                # sensors_temperatures not available, try manual reading
-                import os
-                thermal_path = '/sys/class/thermal'
-                
-                if os.path.exists(thermal_path):
-                    for i in range(10):  # Check first 10 thermal zones
-                        temp_file = f'{thermal_path}/thermal_zone{i}/temp'
-                        type_file = f'{thermal_path}/thermal_zone{i}/type'
-                        
-                        if os.path.exists(temp_file):
-                            with open(temp_file, 'r') as f:
-                                temp = float(f.read().strip()) / 1000.0  # Convert millidegrees to degrees
-                            
-                            zone_type = f'zone{i}'
-                            if os.path.exists(type_file):
-                                with open(type_file, 'r') as f:
-                                    zone_type = f.read().strip()
-                            
-                            temps[zone_type] = round(temp, 2)
+                        temps[key] = reading.current
             
             return temps if temps else {'cpu_thermal': 0.0}
             
@@ -165,8 +359,8 @@ class JetsonTelemetry:
             net_io = psutil.net_io_counters()
             
             return {
-                'bytes_sent_mb': round(net_io.bytes_sent / (1024 * 1024), 2),
-                'bytes_recv_mb': round(net_io.bytes_recv / (1024 * 1024), 2),
+                'bytes_sent_mb': net_io.bytes_sent / (1024 * 1024),
+                'bytes_recv_mb': net_io.bytes_recv / (1024 * 1024),
                 'packets_sent': net_io.packets_sent,
                 'packets_recv': net_io.packets_recv,
                 'errors_in': net_io.errin,
@@ -183,32 +377,25 @@ class JetsonTelemetry:
             'device': 'jetson'
         }
         
-        # Collect enabled metrics
-        if 'cpu_usage' in self.metrics:
-            data.update(self._get_cpu_usage())
-        
-        if 'memory_usage' in self.metrics:
-            data.update(self._get_memory_usage())
-        
-        if 'gpu_usage' in self.metrics:
-            data.update(self._get_gpu_usage())
-        
-        if 'temperature' in self.metrics:
-            temps = self._get_temperature()
-            data['temperatures'] = temps
-        
-        if 'network_stats' in self.metrics:
-            data.update(self._get_network_stats())
+        # Collect enabled metrics, each only once its own interval has passed
+        now = time.monotonic()
+        for metric, collect in self._collectors:
+            sampled = self._metric_sampled.get(metric)
+            if sampled is None or now - sampled >= self.metric_intervals.get(metric, 0.0):
+                self._metric_cache[metric] = collect()
+                self._metric_sampled[metric] = now
+            data.update(self._metric_cache[metric])
         
         if 'camera_fps' in self.metrics:
-            data['camera_fps'] = round(self.camera_fps, 2)
-            data['stream_fps'] = round(self.stream_fps, 2)
+            data['camera_fps'] = self.camera_fps
+            data['stream_fps'] = self.stream_fps
         
         return data
     
     def _telemetry_loop(self):
         """Background telemetry collection loop."""
         logger.info("Starting telemetry collection loop")
+        set_thread_scheduling("Telemetry thread", self.thread_cpu, nice=self.thread_nice)
         interval = 1.0 / self.rate_hz
         
         while self.running:
@@ -219,21 +406,21 @@ class JetsonTelemetry:
                 telemetry_data = self._collect_telemetry()
                 self.current_data = telemetry_data
                 
-                # Call registered callbacks
+                # Call registered callbacks (snapshot; registration swaps the tuple)
                 for callback in self.callbacks:
                     try:
                         callback(telemetry_data)
                     except Exception as e:
                         logger.error(f"Error in telemetry callback: {e}")
                 
-                # Sleep for remaining time
+                # Sleep for remaining time (returns early on stop)
                 elapsed = time.time() - start_time
                 sleep_time = max(0, interval - elapsed)
-                time.sleep(sleep_time)
+                self._stop_event.wait(sleep_time)
                 
             except Exception as e:
                 logger.error(f"Error in telemetry loop: {e}")
-                time.sleep(interval)
+                self._stop_event.wait(interval)
         
         logger.info("Telemetry collection loop stopped")
     
@@ -244,7 +431,8 @@ class JetsonTelemetry:
         Args:
             callback: Function that accepts telemetry dictionary
         """
-        self.callbacks.append(callback)
+        with self._callbacks_lock:
+            self.callbacks = self.callbacks + (callback,)
         logger.info(f"Registered telemetry callback: {callback.__name__}")
     
     def update_camera_fps(self, fps: float):
@@ -256,8 +444,13 @@ class JetsonTelemetry:
         self.stream_fps = fps
     
     def get_current_data(self) -> Dict:
-        """Get the most recent telemetry data."""
-        return self.current_data.copy()
+        """
+        Get the most recent telemetry data.
+        
+        Returns the collector's snapshot itself, not a copy: each sample is a
+        new dict that is never modified, so callers must not modify it either.
+        """
+        return self.current_data
     
     def start(self):
         """Start telemetry collection."""
@@ -266,6 +459,17 @@ class JetsonTelemetry:
             return
         
         self.running = True
+        self._stop_event.clear()
+        
+        if 'temperature' in self.metrics:
+            self._open_thermal_zones()
+        
+        # Prime psutil's CPU counters so the first sample has a baseline
+        psutil.cpu_percent(interval=None, percpu=True)
+        
+        if 'gpu_usage' in self.metrics:
+            self._start_tegrastats()
+        
         self.telemetry_thread = threading.Thread(target=self._telemetry_loop, daemon=True)
         self.telemetry_thread.start()
         logger.info("Telemetry collection started")
@@ -274,10 +478,19 @@ class JetsonTelemetry:
         """Stop telemetry collection."""
         logger.info("Stopping telemetry collection")
         self.running = False
+        self._stop_event.set()
         
         if self.telemetry_thread:
             self.telemetry_thread.join(timeout=2.0)
         
+        self._stop_tegrastats()
+        
+        # The loop may still pread() the fds; only close them once it has exited
+        if self.telemetry_thread and self.telemetry_thread.is_alive():
+            logger.warning("Telemetry thread did not stop, leaving thermal zone files open")
+        else:
+            self._close_thermal_zones()
+        
         logger.info("Telemetry collection stopped")
     
     def __enter__(self):
@@ -0,0 +1,155 @@
+"""
+UDP Sender Module
+Fragments a buffer into datagrams and sends them with a single
+sendmmsg() system call on Linux, falling back to one sendto() per
+datagram elsewhere.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import socket
+import struct
+import logging
+from typing import Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [
+        ('iov_base', ctypes.c_void_p),
+        ('iov_len', ctypes.c_size_t),
+    ]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [
+        ('msg_name', ctypes.c_void_p),
+        ('msg_namelen', ctypes.c_uint32),
+        ('msg_iov', ctypes.POINTER(_IOVec)),
+        ('msg_iovlen', ctypes.c_size_t),
+        ('msg_control', ctypes.c_void_p),
+        ('msg_controllen', ctypes.c_size_t),
+        ('msg_flags', ctypes.c_int),
+    ]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [
+        ('msg_hdr', _MsgHdr),
+        ('msg_len', ctypes.c_uint),
+    ]
+
+
+try:
+    _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    _sendmmsg = _libc.sendmmsg
+    _sendmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int]
+    _sendmmsg.restype = ctypes.c_int
+    SENDMMSG_AVAILABLE = ctypes.sizeof(_IOVec) == 2 * np.dtype(np.uintp).itemsize
+except (OSError, AttributeError, TypeError):
+    _sendmmsg = None
+    SENDMMSG_AVAILABLE = False
+
+
+class UdpFragmentSender:
+    """
+    Sends a buffer as fixed-size UDP fragments to one destination.
+    All fragments of a buffer go out in one sendmmsg() call where
+    available; the fragments point into the caller's buffer, no copies.
+    """
+    
+    def __init__(self, sock: socket.socket, addr: Tuple[str, int], max_packet_size: int = 1400):
+        """
+        Initialize sender.
+        
+        Args:
+            sock: UDP socket to send on
+            addr: Destination (host, port)
+            max_packet_size: Maximum datagram payload size
+        """
+        self.sock = sock
+        self.addr = addr
+        self.max_packet_size = max_packet_size
+        self.batched = SENDMMSG_AVAILABLE and sock.family == socket.AF_INET
+        
+        # Message arrays, grown on demand in _reserve()
+        self._capacity = 0
+        self._iov = None
+        self._iov_view = None
+        self._msgs = None
+        
+        if self.batched:
+            # struct sockaddr_in: family (host order), port, address, zero padding
+            sockaddr = struct.pack('=H', socket.AF_INET) + struct.pack('!H', addr[1]) + \
+                socket.inet_aton(socket.gethostbyname(addr[0])) + bytes(8)
+            self._sockaddr = ctypes.create_string_buffer(sockaddr, len(sockaddr))
+            self._reserve(64)
+    
+    def _reserve(self, count: int):
+        """Make room for at least count messages."""
+        capacity = max(count, self._capacity * 2)
+        
+        self._iov = (_IOVec * capacity)()
+        self._msgs = (_MMsgHdr * capacity)()
+        
+        # (iov_base, iov_len) pairs, filled per send with array ops
+        self._iov_view = np.frombuffer(self._iov, dtype=np.uintp).reshape(capacity, 2)
+        
+        # Each message carries one iovec and the fixed destination
+        name = ctypes.cast(self._sockaddr, ctypes.c_void_p)
+        namelen = len(self._sockaddr)
+        for i in range(capacity):
+            hdr = self._msgs[i].msg_hdr
+            hdr.msg_name = name
+            hdr.msg_namelen = namelen
+            hdr.msg_iov = ctypes.pointer(self._iov[i])
+            hdr.msg_iovlen = 1
+        
+        self._capacity = capacity
+    
+    def send(self, data) -> int:
+        """
+        Send a buffer as one or more datagrams.
+        
+        Args:
+            data: Bytes-like object (bytes or contiguous uint8 array)
+        
+        Returns:
+            Number of datagrams sent
+        """
+        buf = np.frombuffer(data, dtype=np.uint8)
+        size = buf.size
+        step = self.max_packet_size
+        count = (size + step - 1) // step
+        
+        if not self.batched or count <= 1:
+            view = memoryview(buf)
+            sendto = self.sock.sendto
+            addr = self.addr
+            for start in range(0, size, step):
+                sendto(view[start:start + step], addr)
+            return count
+        
+        if count > self._capacity:
+            self._reserve(count)
+        
+        # Point each iovec at its fragment of the caller's buffer
+        offsets = np.arange(0, size, step, dtype=np.uintp)
+        iov = self._iov_view[:count]
+        iov[:, 0] = buf.ctypes.data + offsets
+        iov[:, 1] = step
+        iov[-1, 1] = size - int(offsets[-1])
+        
+        fd = self.sock.fileno()
+        sent = 0
+        while sent < count:
+            n = _sendmmsg(fd, ctypes.byref(self._msgs[sent]), count - sent, 0)
+            if n < 0:
+                err = ctypes.get_errno()
+                raise OSError(err, os.strerror(err))
+            sent += n
+        
+        return count
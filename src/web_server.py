@@ -4,19 +4,41 @@ Provides web UI for monitoring camera streams and telemetry data.
 Uses Flask and SocketIO for real-time updates.
 """
 
-from flask import Flask, render_template, Response, jsonify
+from flask import Flask, render_template, Response, jsonify, request
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit
 import cv2
 import numpy as np
+import hashlib
 import logging
-import json
+import orjson
 from typing import Optional, Dict
 import threading
 import time
 
+try:
+    from .jpeg_encoder import JpegEncoder
+except ImportError:
+    from jpeg_encoder import JpegEncoder
+
 logger = logging.getLogger(__name__)
 
+# Multipart framing around each JPEG in the MJPEG stream
+MJPEG_PART_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+MJPEG_PART_TRAILER = b'\r\n'
+
+
+class _OrjsonModule:
+    """json-module stand-in so SocketIO serializes event payloads with orjson."""
+    
+    @staticmethod
+    def dumps(obj, *args, **kwargs) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    
+    @staticmethod
+    def loads(s, *args, **kwargs):
+        return orjson.loads(s)
+
 
 class WebServer:
     """
@@ -43,14 +65,38 @@ class WebServer:
         self.app.config['SECRET_KEY'] = 'jetson-stream-secret'
         
         CORS(self.app)
-        self.socketio = SocketIO(self.app, cors_allowed_origins="*")
+        self.socketio = SocketIO(self.app, cors_allowed_origins="*", json=_OrjsonModule)
         
         # State
         self.current_frame = None
         self.frame_lock = threading.Lock()
+        
+        # Signalled on every new frame; viewers wait on it instead of polling
+        self.frame_cond = threading.Condition(self.frame_lock)
+        self.frame_seq = 0
+        self.viewer_count = 0
+        self.client_count = 0  # Connected SocketIO clients
         self.telemetry_data = {}
         self.telemetry_lock = threading.Lock()
         
+        # Telemetry broadcast: capped rate, only fields changed since the last one
+        self.broadcast_interval = 1.0 / config.get('telemetry_broadcast_hz', 2)
+        self._last_broadcast = 0.0
+        self._last_broadcast_data = {}
+        
+        # MJPEG encoding (NVJPEG on Jetson when available), placeholder part built once
+        self.jpeg_encoder = JpegEncoder(config.get('jpeg_encoder', 'auto'), quality=80)
+        self._blank_part = self._mjpeg_part(self._encode_blank_frame())
+        
+        # Latest encoded part, shared by all viewers: one encode per frame
+        self._encode_lock = threading.Lock()
+        self._part_seq = -1
+        self._part = None
+        
+        # Index page, rendered on first request and served from memory afterwards
+        self._index_html = None
+        self._index_etag = None
+        
         # Setup routes
         self._setup_routes()
         
@@ -62,7 +108,16 @@ class WebServer:
         @self.app.route('/')
         def index():
             """Main page."""
-            return render_template('index.html')
+            # Re-render every time in debug mode so template edits show up
+            if self._index_html is None or self.debug:
+                html = render_template('index.html').encode('utf-8')
+                self._index_etag = hashlib.sha1(html).hexdigest()
+                self._index_html = html
+            
+            response = Response(self._index_html, mimetype='text/html')
+            response.set_etag(self._index_etag)
+            response.headers['Cache-Control'] = 'no-cache'  # Revalidate, 304 if unchanged
+            return response.make_conditional(request)
         
         @self.app.route('/api/status')
         def status():
@@ -76,7 +131,9 @@ class WebServer:
         def get_telemetry():
             """Get current telemetry data."""
             with self.telemetry_lock:
-                return jsonify(self.telemetry_data)
+                data = self.telemetry_data
+            return Response(orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY),
+                            mimetype='application/json')
         
         @self.app.route('/video_feed')
         def video_feed():
@@ -91,11 +148,23 @@ class WebServer:
             """Handle client connection."""
             logger.info(f"Client connected")
             emit('status', {'status': 'connected'})
+            
+            # Full snapshot first; broadcasts after this carry only changes
+            with self.telemetry_lock:
+                self.client_count += 1
+                emit('telemetry_update', self.telemetry_data)
+                
+                # That snapshot may be newer than the last broadcast; make the next
+                # broadcast a full one so every client is diffed from the same state
+                self._last_broadcast_data = {}
+                self._last_broadcast = 0.0
         
         @self.socketio.on('disconnect')
         def handle_disconnect():
             """Handle client disconnection."""
             logger.info(f"Client disconnected")
+            with self.telemetry_lock:
+                self.client_count -= 1
         
         @self.socketio.on('request_telemetry')
         def handle_telemetry_request():
@@ -103,29 +172,82 @@ class WebServer:
             with self.telemetry_lock:
                 emit('telemetry_update', self.telemetry_data)
     
+    @staticmethod
+    def _encode_blank_frame() -> bytes:
+        """Encode the 'No Camera Feed' placeholder shown when no frame is available."""
+        blank = np.zeros((480, 640, 3), dtype=np.uint8)
+        cv2.putText(blank, 'No Camera Feed', (200, 240),
+                  cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        _, buffer = cv2.imencode('.jpg', blank)
+        return buffer.tobytes()
+    
+    @staticmethod
+    def _mjpeg_part(jpeg) -> bytes:
+        """
+        Frame a JPEG as one multipart chunk of the MJPEG stream.
+        
+        Args:
+            jpeg: Encoded JPEG (bytes or flat uint8 array)
+            
+        Returns:
+            Boundary, part header, JPEG and trailer in one buffer (single copy)
+        """
+        return b''.join((MJPEG_PART_HEADER, jpeg, MJPEG_PART_TRAILER))
+    
+    def _encoded_part(self, frame: np.ndarray, seq: int):
+        """
+        Get the MJPEG part for a frame, encoding it only if no viewer has yet.
+        
+        Args:
+            frame: Video frame (numpy array in BGR format)
+            seq: Sequence number of the frame
+            
+        Returns:
+            Tuple of (seq, part); seq may be newer than requested if another
+            viewer already encoded a later frame
+        """
+        with self._encode_lock:
+            if self._part_seq < seq:
+                encoded = self.jpeg_encoder.encode(frame)
+                self._part = self._mjpeg_part(encoded) if encoded is not None else self._blank_part
+                self._part_seq = seq
+            return self._part_seq, self._part
+    
     def _generate_frames(self):
         """
         Generator for video streaming.
         Yields JPEG frames for MJPEG stream.
         """
-        while True:
-            with self.frame_lock:
-                if self.current_frame is None:
+        with self.frame_lock:
+            self.viewer_count += 1
+        
+        last_seq = -1
+        part = None
+        
+        try:
+            while True:
+                # Wait for a frame this viewer has not sent yet; only the
+                # reference swap is locked, encoding runs outside
+                with self.frame_cond:
+                    self.frame_cond.wait_for(lambda: self.frame_seq != last_seq, timeout=1.0)
+                    frame = self.current_frame
+                    seq = self.frame_seq
+                
+                if frame is None:
                     # Send blank frame if no frame available
-                    blank = np.zeros((480, 640, 3), dtype=np.uint8)
-                    cv2.putText(blank, 'No Camera Feed', (200, 240),
-                              cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-                    _, buffer = cv2.imencode('.jpg', blank)
-                else:
-                    _, buffer = cv2.imencode('.jpg', self.current_frame,
-                                            [cv2.IMWRITE_JPEG_QUALITY, 80])
-            
-            frame_bytes = buffer.tobytes()
-            
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-            
-            time.sleep(0.033)  # ~30 fps
+                    part = self._blank_part
+                elif seq != last_seq or part is None:
+                    seq, part = self._encoded_part(frame, seq)
+                # else: timed out with no new frame, resend the last part as keep-alive
+                
+                last_seq = seq
+                
+                yield part
+        finally:
+            with self.frame_lock:
+                self.viewer_count -= 1
+                if self.viewer_count == 0:
+                    self.current_frame = None
     
     def update_frame(self, frame: np.ndarray):
         """
@@ -134,8 +256,16 @@ class WebServer:
         Args:
             frame: Video frame (numpy array)
         """
-        with self.frame_lock:
-            self.current_frame = frame.copy()
+        # Nobody is watching the MJPEG feed, skip the update
+        if not self.viewer_count:
+            return
+        
+        # Keep a reference, no copy: the main loop hands over a frame nothing
+        # writes to again (a downscaled or copied frame, never a camera ring slot)
+        with self.frame_cond:
+            self.current_frame = frame
+            self.frame_seq += 1
+            self.frame_cond.notify_all()
     
     def update_telemetry(self, telemetry: Dict):
         """
@@ -144,15 +274,39 @@ class WebServer:
         Args:
             telemetry: Telemetry data dictionary
         """
+        # Keep a reference: producers hand over a fresh dict per update and never modify it
         with self.telemetry_lock:
-            self.telemetry_data = telemetry.copy()
+            self.telemetry_data = telemetry
         
-        # Broadcast to all connected clients
-        self.socketio.emit('telemetry_update', telemetry)
+        # No SocketIO clients: skip the delta and its serialization entirely
+        if not self.client_count:
+            return
+        
+        # Rate-limit broadcasts; /api/telemetry and request_telemetry still see every update
+        now = time.monotonic()
+        if now - self._last_broadcast < self.broadcast_interval:
+            return
+        self._last_broadcast = now
+        
+        # Broadcast only the fields that changed (clients merge into their state);
+        # fields that dropped out of the snapshot are sent as None for removal
+        last = self._last_broadcast_data
+        delta = {k: v for k, v in telemetry.items() if last.get(k) != v}
+        for k in last.keys() - telemetry.keys():
+            delta[k] = None
+        self._last_broadcast_data = telemetry
+        
+        if delta:
+            self.socketio.emit('telemetry_update', delta)
     
     def run(self):
         """Run the web server (blocking)."""
         logger.info(f"Starting web server on {self.host}:{self.port}")
+        
+        # Werkzeug logs every request (including SocketIO polls) at INFO; keep that to debug mode
+        if not self.debug:
+            logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        
         self.socketio.run(
             self.app,
             host=self.host,
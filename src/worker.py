@@ -0,0 +1,143 @@
+"""
+Worker Module
+Single-thread worker that runs only the most recently submitted jobs.
+Used to move per-frame sink work (encoding, sending) off the main loop.
+"""
+
+import os
+import threading
+import logging
+from collections import deque
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def set_thread_scheduling(label: str, cpu: Optional[int] = None, rt_priority: int = 0, nice: int = 0):
+    """
+    Pin the calling thread to a CPU core and adjust its priority (Linux only).
+    
+    Args:
+        label: Thread description used in log messages
+        cpu: CPU core to pin to, or None to leave the affinity alone
+        rt_priority: SCHED_FIFO priority (needs CAP_SYS_NICE), 0 = off
+        nice: Niceness increment; applied directly when rt_priority is 0, or as
+            the fallback when SCHED_FIFO is unavailable (negative needs CAP_SYS_NICE)
+    """
+    if cpu is not None:
+        try:
+            os.sched_setaffinity(0, {int(cpu)})
+            logger.info(f"{label} pinned to CPU {cpu}")
+        except (AttributeError, OSError) as e:
+            logger.warning(f"Could not pin {label} to CPU {cpu}: {e}")
+    
+    if rt_priority:
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(int(rt_priority)))
+            logger.info(f"{label} using SCHED_FIFO priority {rt_priority}")
+            return
+        except (AttributeError, OSError) as e:
+            logger.warning(f"SCHED_FIFO unavailable for {label} ({e}), trying nice {nice:+d}")
+    
+    if nice:
+        try:
+            os.nice(int(nice))
+        except OSError as e:
+            logger.warning(f"Could not change {label} priority: {e}")
+
+
+class SingleThreadWorker:
+    """
+    Background worker with a small bounded job ring.
+    Submitting while the ring is full drops the oldest pending job, so
+    slow sinks shed stale work instead of queueing it.
+    """
+    
+    def __init__(self, name: str, max_pending: int = 1, cpu: Optional[int] = None, nice: int = 0):
+        """
+        Initialize worker.
+        
+        Args:
+            name: Worker name (used for the thread name and logging)
+            max_pending: Number of jobs that may wait while one is running
+            cpu: CPU core to pin the worker thread to, or None
+            nice: Niceness increment for the worker thread (positive = lower priority)
+        """
+        self.name = name
+        self.cpu = cpu
+        self.nice = nice
+        self.running = False
+        self.thread = None
+        
+        # Pending (job, on_drop) pairs; deque append/popleft are atomic under the GIL
+        self._jobs = deque(maxlen=max_pending)
+        self._wake = threading.Event()
+    
+    def _run(self):
+        """Worker loop: drain pending jobs whenever woken."""
+        set_thread_scheduling(f"{self.name} worker", self.cpu, nice=self.nice)
+        
+        while self.running:
+            self._wake.wait()
+            self._wake.clear()
+            
+            while self.running:
+                try:
+                    job, _ = self._jobs.popleft()
+                except IndexError:
+                    break
+                
+                try:
+                    job()
+                except Exception as e:
+                    logger.error(f"Error in {self.name} worker job: {e}")
+    
+    def try_submit(self, job: Callable[[], None], on_drop: Optional[Callable[[], None]] = None) -> bool:
+        """
+        Submit a job, dropping the oldest pending job if the ring is full.
+        
+        Args:
+            job: Callable with no arguments
+            on_drop: Called instead of job if the job is dropped before it runs
+                (e.g. to release a buffer the job holds)
+            
+        Returns:
+            True if the job was queued without dropping another
+        """
+        dropped = False
+        if len(self._jobs) == self._jobs.maxlen:
+            try:
+                _, drop = self._jobs.popleft()
+                dropped = True
+                if drop:
+                    drop()
+            except IndexError:
+                pass  # The worker took it in the meantime
+        
+        self._jobs.append((job, on_drop))
+        self._wake.set()
+        return not dropped
+    
+    def start(self):
+        """Start the worker thread."""
+        if self.running:
+            return
+        
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """Stop the worker thread, discarding any pending jobs."""
+        self.running = False
+        self._wake.set()
+        
+        if self.thread:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+        
+        # Pending jobs never run; let them release what they hold
+        while self._jobs:
+            _, drop = self._jobs.popleft()
+            if drop:
+                drop()
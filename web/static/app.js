@@ -3,6 +3,7 @@ const socket = io();
 
 // State
 let lastUpdateTime = Date.now();
+let telemetryState = {};  // Merged telemetry; broadcasts carry only changed fields (null = removed)
 
 // Initialize on page load
 document.addEventListener('DOMContentLoaded', function() {
@@ -21,6 +22,7 @@ function setupSocketHandlers() {
     socket.on('disconnect', function() {
         console.log('Disconnected from server');
         updateStatus('Disconnected', false);
+        telemetryState = {};  // The server sends a full snapshot on reconnect
     });
 
     socket.on('status', function(data) {
@@ -29,7 +31,14 @@ function setupSocketHandlers() {
 
     socket.on('telemetry_update', function(data) {
         console.log('Telemetry update:', data);
-        updateTelemetry(data);
+        for (const [key, value] of Object.entries(data)) {
+            if (value === null) {
+                delete telemetryState[key];
+            } else {
+                telemetryState[key] = value;
+            }
+        }
+        updateTelemetry(telemetryState);
     });
 }
 
@@ -148,16 +157,14 @@ function getTempColor(temp) {
     return 'var(--accent-red)';
 }
 
-// Request telemetry updates
+// Watch for stalled telemetry (the server pushes updates, no polling)
 function startHeartbeat() {
     setInterval(function() {
-        socket.emit('request_telemetry');
-        
         // Check if we've lost connection (no updates for 5 seconds)
         if (Date.now() - lastUpdateTime > 5000) {
             console.warn('No telemetry updates received');
         }
-    }, 1000); // Request every second
+    }, 1000); // Check every second
 }
 
 // Handle video feed errors